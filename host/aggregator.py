@@ -0,0 +1,372 @@
+# Sonos state aggregator for running many monitors off one set of polls.
+#
+# Talks to each player over kept-alive HTTP connections and pushes a
+# small binary state packet to every subscribed monitor over UDP, on each
+# change and as a heartbeat. Speaker load stays the same no matter how
+# many monitors subscribe. Like the firmware (FOLLOW_GROUP), a grouped
+# player reports its group's volume, read from the group coordinator,
+# and the coordinator is looked up again on topology change events.
+#
+#   python3 host/aggregator.py 192.168.86.40 "192.168.86.41=Kitchen"
+#   python3 host/aggregator.py --multicast 239.255.46.10 192.168.86.40
+#
+# Monitors subscribe by sending a subscribe packet naming the player IP
+# (AGGREGATOR_IP in main_time.py), or listen on the multicast group
+# (PUSH_GROUP). The group carries every player's packets; each names its
+# player's address, and monitors keep only SONOS_IP's.
+import argparse
+import html
+import http.client
+import http.server
+import os
+import socket
+import struct
+import threading
+import time
+import xml.etree.ElementTree as ET
+from urllib.parse import urlparse
+
+# Keep in sync with the PUSH MODE section of main_time.py
+STATE_FMT = "!2sBBHIIB4s16s"  # magic, version, flags, session, seq, time, volume, player ip, room
+MAGIC = b"SM"
+SUBSCRIBE_MAGIC = b"SS"
+VERSION = 2
+FLAG_MUTE = 0x01
+FLAG_OK = 0x02
+
+DEFAULT_PORT = 4610          # Subscriptions arrive here
+DEFAULT_PUSH_PORT = 4611     # Monitors listen here
+DEFAULT_EVENT_PORT = 3500    # Players send topology NOTIFYs here
+SUBSCRIPTION_TTL = 90        # Monitors renew every 30 s
+EVENT_TIMEOUT = 1800         # Topology event subscription length, renewed at half
+TOPOLOGY_CHECK_INTERVAL = 30 # Without events, re-read the group ID this often
+
+RC = ("/MediaRenderer/RenderingControl/Control",
+      "urn:schemas-upnp-org:service:RenderingControl:1",
+      "<InstanceID>0</InstanceID><Channel>Master</Channel>")
+GRC = ("/MediaRenderer/GroupRenderingControl/Control",
+       "urn:schemas-upnp-org:service:GroupRenderingControl:1",
+       "<InstanceID>0</InstanceID>")
+ZGT = ("/ZoneGroupTopology/Control",
+       "urn:schemas-upnp-org:service:ZoneGroupTopology:1",
+       "")
+ZGT_EVENT_PATH = "/ZoneGroupTopology/Event"
+
+SOAP_BODY = """<?xml version="1.0" encoding="utf-8"?>
+<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/">
+  <s:Body>
+    <u:{action} xmlns:u="{service}">{args}</u:{action}>
+  </s:Body>
+</s:Envelope>"""
+
+
+def extract(text, tag):
+    start = text.find("<{}>".format(tag))
+    if start == -1:
+        return None
+    start += len(tag) + 2
+    return text[start:text.find("</{}>".format(tag), start)]
+
+
+def find_coordinator(state, ip):
+    """IP of the coordinator of ip's group, from a ZoneGroupState document"""
+    try:
+        root = ET.fromstring(state)
+    except ET.ParseError:
+        return None
+    for group in root.iter("ZoneGroup"):
+        members = group.findall("ZoneGroupMember")
+        if any("//{}:".format(ip) in m.get("Location", "") for m in members):
+            for m in members:
+                if m.get("UUID") == group.get("Coordinator"):
+                    return urlparse(m.get("Location")).hostname
+    return None
+
+
+class Player:
+    """One speaker, polled over persistent HTTP connections (one to it,
+    one to its group coordinator when that is another player)."""
+
+    def __init__(self, ip, room=None, timeout=2):
+        self.ip = ip
+        self.address = socket.inet_aton(ip)
+        self.timeout = timeout
+        self.conns = {}          # ip -> HTTPConnection
+        self.room = room or self.fetch_room() or ip
+        self.volume = 0
+        self.mute = False
+        self.ok = False
+        self.seq = 0
+        self.polls = 0
+        # Zone group, followed like ZoneTopology in main_time.py
+        self.group_id = None
+        self.coordinator = ip
+        self.recheck = True      # Re-read the group ID before the next poll
+        self.checked_at = 0.0
+        self.sid = None          # Topology event subscription
+        self.sid_expires = 0.0
+
+    def _request(self, method, path, body=None, headers=None, ip=None):
+        ip = ip or self.ip
+        for attempt in (1, 2):
+            conn = self.conns.get(ip)
+            if conn is None:
+                conn = self.conns[ip] = http.client.HTTPConnection(ip, 1400, timeout=self.timeout)
+            try:
+                conn.request(method, path, body, headers or {})
+                resp = conn.getresponse()
+                return resp.read().decode("utf-8", "ignore")
+            except (OSError, http.client.HTTPException):
+                # Dropped keep-alive: reconnect once, then give up
+                conn.close()
+                del self.conns[ip]
+                if attempt == 2:
+                    raise
+
+    def _subscribe(self, headers):
+        """Send a SUBSCRIBE. Returns (status, SID, TIMEOUT header)."""
+        conn = http.client.HTTPConnection(self.ip, 1400, timeout=self.timeout)
+        try:
+            conn.request("SUBSCRIBE", ZGT_EVENT_PATH, headers=headers)
+            resp = conn.getresponse()
+            resp.read()
+            return resp.status, resp.getheader("SID"), resp.getheader("TIMEOUT")
+        finally:
+            conn.close()
+
+    def fetch_room(self):
+        try:
+            return extract(self._request("GET", "/xml/device_description.xml"), "roomName")
+        except (OSError, http.client.HTTPException):
+            return None
+
+    def call(self, action, service=RC, ip=None):
+        """POST a SOAP action; returns the response body"""
+        path, urn, args = service
+        body = SOAP_BODY.format(action=action, service=urn, args=args)
+        headers = {
+            "Content-Type": 'text/xml; charset="utf-8"',
+            "SOAPACTION": '"{}#{}"'.format(urn, action),
+        }
+        return self._request("POST", path, body, headers, ip)
+
+    def soap(self, action, tag, service=RC, ip=None):
+        return extract(self.call(action, service, ip), tag)
+
+    def events_live(self):
+        return self.sid is not None and time.monotonic() < self.sid_expires
+
+    def subscribe(self, callback):
+        """Subscribe to topology events, or renew at half the timeout"""
+        now = time.monotonic()
+        if self.events_live() and now < self.sid_expires - EVENT_TIMEOUT / 2:
+            return
+        headers = {"TIMEOUT": "Second-{}".format(EVENT_TIMEOUT)}
+        if self.events_live():
+            headers["SID"] = self.sid
+        else:
+            headers.update(CALLBACK="<{}>".format(callback), NT="upnp:event")
+        try:
+            status, sid, granted = self._subscribe(headers)
+        except (OSError, http.client.HTTPException):
+            status, sid, granted = None, None, None
+        if status != 200 or not sid:
+            self.sid = None
+            self.sid_expires = now + TOPOLOGY_CHECK_INTERVAL  # Retry then
+            return
+        seconds = EVENT_TIMEOUT
+        if granted and granted.startswith("Second-") and granted[7:].isdigit():
+            seconds = int(granted[7:])
+        self.sid = sid
+        self.sid_expires = now + seconds
+
+    def check_group(self):
+        """Re-read the group ID when an event or the timer asks for it, and
+        look the coordinator up again if it changed."""
+        now = time.monotonic()
+        if not self.recheck and (self.events_live() or now - self.checked_at < TOPOLOGY_CHECK_INTERVAL):
+            return
+        self.recheck = False
+        self.checked_at = now
+        attributes = self.call("GetZoneGroupAttributes", ZGT)
+        group_id = extract(attributes, "CurrentZoneGroupID")
+        if not group_id or group_id == self.group_id:
+            return
+        members = extract(attributes, "CurrentZonePlayerUUIDsInGroup") or ""
+        coordinator = self.ip
+        if "," in members:
+            state = self.soap("GetZoneGroupState", "ZoneGroupState", ZGT)
+            coordinator = find_coordinator(html.unescape(state or ""), self.ip)
+            if coordinator is None:
+                return  # Keep the old target, retry at the next check
+        self.group_id = group_id
+        self.coordinator = coordinator
+        print("{}: group of {}, coordinator {}".format(
+            self.room, members.count(",") + 1, coordinator))
+
+    def poll(self):
+        """Refresh state. Returns True if anything the monitors show changed."""
+        self.polls += 1
+        try:
+            self.check_group()
+            if self.group_id is not None:
+                ip = self.coordinator
+                volume = int(self.soap("GetGroupVolume", "CurrentVolume", GRC, ip)) // 2
+                mute = self.soap("GetGroupMute", "CurrentMute", GRC, ip) == "1"
+            else:
+                volume = int(self.soap("GetVolume", "CurrentVolume")) // 2
+                mute = self.soap("GetMute", "CurrentMute") == "1"
+            ok = True
+        except (OSError, http.client.HTTPException, TypeError, ValueError):
+            if self.group_id is not None:
+                self.recheck = True  # The coordinator may have moved
+            volume, mute, ok = self.volume, self.mute, False
+        changed = (volume, mute, ok) != (self.volume, self.mute, self.ok)
+        self.volume, self.mute, self.ok = volume, mute, ok
+        return changed
+
+    def packet(self, session):
+        self.seq = (self.seq + 1) & 0xFFFFFFFF
+        flags = (FLAG_MUTE if self.mute else 0) | (FLAG_OK if self.ok else 0)
+        # Truncate on a character boundary
+        room = self.room.encode()[:16].decode("utf-8", "ignore").encode()
+        return struct.pack(STATE_FMT, MAGIC, VERSION, flags, session, self.seq,
+                           int(time.time()), self.volume, self.address, room)
+
+
+def local_ip(peer):
+    """Address of the interface that reaches peer"""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.connect((peer, 1400))
+        return s.getsockname()[0]
+
+
+class EventHandler(http.server.BaseHTTPRequestHandler):
+    """Topology NOTIFYs: flag the subscribed player for a group re-check"""
+
+    def do_NOTIFY(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        sid = self.headers.get("SID")
+        for player in self.server.players:
+            if sid and player.sid == sid:
+                player.recheck = True
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Aggregator:
+    def __init__(self, players, port=DEFAULT_PORT, push_port=DEFAULT_PUSH_PORT,
+                 multicast=None, interval=0.5, heartbeat=2.0,
+                 event_port=DEFAULT_EVENT_PORT):
+        self.players = {p.ip: p for p in players}
+        self.push_port = push_port
+        self.events = None
+        if event_port is not None:
+            self.events = http.server.ThreadingHTTPServer(("0.0.0.0", event_port), EventHandler)
+            self.events.daemon_threads = True
+            self.events.players = players
+        self.multicast = multicast
+        self.interval = interval
+        self.heartbeat = heartbeat
+        self.session = int.from_bytes(os.urandom(2), "big")
+        self.subscribers = {}  # (ip, port) -> (player ip, expiry)
+        self.lock = threading.Lock()
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(("0.0.0.0", port))
+        if multicast:
+            self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+        self.sent = 0
+
+    def subscribe(self, data, addr):
+        if len(data) < 4 or data[:2] != SUBSCRIBE_MAGIC or data[2] != VERSION:
+            return
+        player_ip = data[3:].decode("ascii", "ignore")
+        if player_ip not in self.players:
+            print("Unknown player {} requested by {}".format(player_ip, addr[0]))
+            return
+        with self.lock:
+            if addr not in self.subscribers:
+                print("Monitor {} subscribed to {}".format(addr[0], player_ip))
+            self.subscribers[addr] = (player_ip, time.monotonic() + SUBSCRIPTION_TTL)
+        # Send current state right away so the monitor doesn't wait for a change
+        self.publish(self.players[player_ip], only=addr)
+
+    def publish(self, player, only=None):
+        with self.lock:
+            pkt = player.packet(self.session)
+            now = time.monotonic()
+            targets = []
+            for addr, (player_ip, expiry) in list(self.subscribers.items()):
+                if expiry < now:
+                    del self.subscribers[addr]
+                elif player_ip == player.ip and (only is None or addr == only):
+                    targets.append(addr)
+            if self.multicast and only is None:
+                targets.append((self.multicast, self.push_port))
+        for addr in targets:
+            try:
+                self.sock.sendto(pkt, addr)
+                self.sent += 1
+            except OSError as e:
+                print("Send to {} failed: {}".format(addr[0], e))
+
+    def callback(self, player):
+        return "http://{}:{}/zgt".format(local_ip(player.ip), self.events.server_address[1])
+
+    def run_player(self, player):
+        last_sent = 0
+        while True:
+            started = time.monotonic()
+            if self.events:
+                player.subscribe(self.callback(player))
+            if player.poll() or started - last_sent >= self.heartbeat:
+                self.publish(player)
+                last_sent = started
+            time.sleep(max(0, self.interval - (time.monotonic() - started)))
+
+    def run(self):
+        if self.events:
+            threading.Thread(target=self.events.serve_forever, daemon=True).start()
+        for player in self.players.values():
+            print("Following {} ({})".format(player.room, player.ip))
+            threading.Thread(target=self.run_player, args=(player,), daemon=True).start()
+        while True:
+            data, addr = self.sock.recvfrom(64)
+            self.subscribe(data, addr)
+
+
+def parse_player(spec):
+    ip, _, room = spec.partition("=")
+    return ip, room or None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Push Sonos state to monitors over UDP")
+    parser.add_argument("players", nargs="+", type=parse_player,
+                        help="player IP, optionally IP=Room")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT,
+                        help="UDP port monitors subscribe on")
+    parser.add_argument("--push-port", type=int, default=DEFAULT_PUSH_PORT,
+                        help="UDP port monitors listen on")
+    parser.add_argument("--multicast", metavar="GROUP",
+                        help="also send every packet to this multicast group")
+    parser.add_argument("--interval", type=float, default=0.5,
+                        help="seconds between polls of each player")
+    parser.add_argument("--heartbeat", type=float, default=2.0,
+                        help="resend unchanged state this often")
+    parser.add_argument("--event-port", type=int, default=DEFAULT_EVENT_PORT,
+                        help="TCP port for topology events (0 re-checks groups on a timer instead)")
+    args = parser.parse_args()
+
+    players = [Player(ip, room) for ip, room in args.players]
+    Aggregator(players, args.port, args.push_port, args.multicast,
+               args.interval, args.heartbeat, args.event_port or None).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+# Micro-benchmarks for the main_time.py hot paths, runnable under CPython
+# and the MicroPython unix port:
+#
+#   python host/bench.py                 run and print
+#   python host/bench.py --save          store results as the baseline
+#   python host/bench.py --compare       flag regressions against it
+#   micropython host/bench.py --compare --threshold 20 render
+#
+# Results are kept per implementation in bench_baseline.json: time per
+# op in microseconds, bytes allocated per op (MicroPython: heap bytes;
+# CPython: tracemalloc peak), and I2C transactions/bytes per op for the
+# display flushes.
+import sys
+import gc
+import json
+
+import emu
+
+BASELINE_FILE = emu.HOST_DIR + "/bench_baseline.json"
+DEFAULT_ITERATIONS = 200
+ALLOC_ITERATIONS = 10
+DEFAULT_THRESHOLD = 10  # Percent
+
+IS_MICROPYTHON = sys.implementation.name == "micropython"
+
+fw = emu.load_firmware()
+import time  # noqa: E402  (ticks_* installed by emu)
+
+# ============================================================
+# FIXTURES
+# ============================================================
+_HEADERS = (
+    "HTTP/1.1 200 OK\r\n"
+    "CONTENT-LENGTH: {}\r\n"
+    "CONTENT-TYPE: text/xml; charset=\"utf-8\"\r\n"
+    "EXT:\r\n"
+    "Server: Linux UPnP/1.0 Sonos/79.1-56030 (ZPS27)\r\n"
+    "X-Sonos-Session: 3C2A7E1F9B\r\n"
+    "Connection: close\r\n\r\n"
+)
+
+_ENVELOPE = (
+    "<s:Envelope xmlns:s=\"http://schemas.xmlsoap.org/soap/envelope/\" "
+    "s:encodingStyle=\"http://schemas.xmlsoap.org/soap/encoding/\">"
+    "<s:Body>{}</s:Body></s:Envelope>"
+)
+
+
+def _response(body):
+    envelope = _ENVELOPE.format(body)
+    return (_HEADERS.format(len(envelope)) + envelope).encode()
+
+
+VOLUME_RESPONSE = _response(
+    "<u:GetVolumeResponse xmlns:u=\"urn:schemas-upnp-org:service:"
+    "RenderingControl:1\"><CurrentVolume>42</CurrentVolume>"
+    "</u:GetVolumeResponse>"
+)
+MUTE_RESPONSE = _response(
+    "<u:GetMuteResponse xmlns:u=\"urn:schemas-upnp-org:service:"
+    "RenderingControl:1\"><CurrentMute>1</CurrentMute>"
+    "</u:GetMuteResponse>"
+)
+FAULT_RESPONSE = _response(
+    "<s:Fault><faultcode>s:Client</faultcode><faultstring>UPnPError"
+    "</faultstring><detail><UPnPError xmlns=\"urn:schemas-upnp-org:control-1-0\">"
+    "<errorCode>402</errorCode></UPnPError></detail></s:Fault>"
+)
+
+# ============================================================
+# BENCHMARKS
+# ============================================================
+def _flush_paged():
+    fw.frames.present()
+    fw.frames.flush()
+
+
+def _flush_step():
+    if not fw.frames.step():
+        fw.frames.present()
+
+
+BENCHES = (
+    ("render.volume", lambda: fw.show_volume(42)),
+    ("render.volume_1digit", lambda: fw.show_volume(7)),
+    ("render.muted", lambda: fw.show_muted(42)),
+    ("render.time", fw.show_time),
+    ("parse.volume", lambda: fw.parse_volume(VOLUME_RESPONSE)),
+    ("parse.mute", lambda: fw.parse_mute(MUTE_RESPONSE)),
+    ("parse.fault", lambda: fw.parse_volume(FAULT_RESPONSE)),
+    ("build.volume", lambda: fw.soap_request(
+        fw.SONOS_IP, fw.RC_PATH, fw.SERVICE_TYPE, "GetVolume", fw.SOAP_VOLUME)),
+    ("build.mute", lambda: fw.soap_request(
+        fw.SONOS_IP, fw.RC_PATH, fw.SERVICE_TYPE, "GetMute", fw.SOAP_MUTE)),
+    ("flush.show", fw.oled.show),
+    ("flush.paged", _flush_paged),
+    ("flush.page_step", _flush_step),
+)
+
+# ============================================================
+# MEASUREMENT
+# ============================================================
+def time_per_op(fn, n):
+    fn()  # Warm up
+    start = time.ticks_us()
+    for _ in range(n):
+        fn()
+    return time.ticks_diff(time.ticks_us(), start) / n
+
+
+def alloc_per_op(fn):
+    if IS_MICROPYTHON:
+        gc.collect()
+        gc.disable()
+        before = gc.mem_alloc()
+        for _ in range(ALLOC_ITERATIONS):
+            fn()
+        used = gc.mem_alloc() - before
+        gc.enable()
+        return used // ALLOC_ITERATIONS
+    import tracemalloc
+    tracemalloc.start()
+    peak = 0
+    for _ in range(ALLOC_ITERATIONS):
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        fn()
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+    return peak
+
+
+def run(names, n):
+    results = {}
+    bus = fw.i2c
+    for name, fn in BENCHES:
+        if names and not any(name.startswith(p) for p in names):
+            continue
+        fw.frames.flush()
+        result = {"us": round(time_per_op(fn, n), 1), "alloc": alloc_per_op(fn)}
+        if name.startswith("flush."):
+            fw.frames.flush()
+            bus.reset_counters()
+            for _ in range(n):
+                fn()
+            result["i2c_tx"] = round(bus.transactions / n, 2)
+            result["i2c_bytes"] = round(bus.bytes / n, 1)
+        results[name] = result
+    return results
+
+# ============================================================
+# BASELINE
+# ============================================================
+def load_baseline():
+    try:
+        with open(BASELINE_FILE) as f:
+            return json.load(f)
+    except OSError:
+        return {}
+
+
+def save_baseline(baseline):
+    # Stable, diff-friendly layout without relying on json indent support
+    lines = []
+    for impl in sorted(baseline):
+        rows = []
+        for name in sorted(baseline[impl]):
+            m = baseline[impl][name]
+            fields = ", ".join(
+                "{}: {}".format(json.dumps(k), json.dumps(m[k])) for k in sorted(m)
+            )
+            rows.append("    {}: {{{}}}".format(json.dumps(name), fields))
+        lines.append("  {}: {{\n{}\n  }}".format(json.dumps(impl), ",\n".join(rows)))
+    with open(BASELINE_FILE, "w") as f:
+        f.write("{\n" + ",\n".join(lines) + "\n}\n")
+
+
+def compare(results, base, threshold):
+    """Print each metric against the baseline. Returns the regression count."""
+    regressions = 0
+    for name in sorted(results):
+        new = results[name]
+        old = base.get(name)
+        if old is None:
+            print("{:24} new".format(name))
+            continue
+        notes = []
+        for key in sorted(new):
+            if key not in old:
+                continue
+            a = old[key]
+            b = new[key]
+            if key.startswith("i2c_"):
+                # I2C traffic is deterministic, so any increase counts
+                worse = b > a
+            else:
+                worse = b > a * (1 + threshold / 100) and b - a > 1
+            if worse:
+                notes.append("{} {} -> {}".format(key, a, b))
+        if notes:
+            regressions += 1
+            print("{:24} REGRESSION {}".format(name, "; ".join(notes)))
+        else:
+            print("{:24} ok".format(name))
+    return regressions
+
+
+def report(results):
+    print("{:24} {:>10} {:>8} {:>7} {:>9}".format("bench", "us/op", "alloc", "i2c_tx", "i2c_bytes"))
+    for name in sorted(results):
+        r = results[name]
+        print("{:24} {:>10} {:>8} {:>7} {:>9}".format(
+            name, r["us"], r["alloc"], r.get("i2c_tx", "-"), r.get("i2c_bytes", "-")))
+
+
+def main(argv):
+    save = "--save" in argv
+    check = "--compare" in argv
+    threshold = DEFAULT_THRESHOLD
+    n = DEFAULT_ITERATIONS
+    names = []
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg == "--threshold":
+            i += 1
+            threshold = float(argv[i])
+        elif arg == "-n":
+            i += 1
+            n = int(argv[i])
+        elif not arg.startswith("--"):
+            names.append(arg)
+        i += 1
+
+    impl = sys.implementation.name
+    results = run(names, n)
+    report(results)
+
+    status = 0
+    baseline = load_baseline()
+    if check:
+        print()
+        print("Compared with {} baseline (threshold {}%):".format(impl, threshold))
+        if compare(results, baseline.get(impl, {}), threshold):
+            status = 1
+    if save:
+        merged = baseline.get(impl, {})
+        merged.update(results)
+        baseline[impl] = merged
+        save_baseline(baseline)
+        print("Saved", impl, "baseline to", BASELINE_FILE)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,128 @@
+# Host emulator for main_time.py. install() registers stand-ins for the
+# MicroPython-only modules so the firmware can be imported under CPython
+# or the MicroPython unix port without hardware.
+import sys
+import time
+
+HOST_DIR = __file__.rsplit("/", 1)[0] if "/" in __file__ else "."
+ROOT_DIR = HOST_DIR + "/.."
+
+
+def _install_ticks():
+    # CPython's time has no ticks_*; the unix port already provides them
+    if hasattr(time, "ticks_ms"):
+        return
+    start = time.perf_counter_ns()
+    time.ticks_us = lambda: (time.perf_counter_ns() - start) // 1000
+    time.ticks_ms = lambda: (time.perf_counter_ns() - start) // 1000000
+    time.ticks_diff = lambda a, b: a - b
+    time.ticks_add = lambda a, b: a + b
+    time.sleep_ms = lambda ms: time.sleep(ms / 1000)
+
+
+def install():
+    if HOST_DIR not in sys.path:
+        sys.path.insert(0, HOST_DIR)
+    if ROOT_DIR not in sys.path:
+        sys.path.insert(0, ROOT_DIR)
+    _install_ticks()
+    try:
+        import framebuf  # noqa: F401
+    except ImportError:
+        import emu_framebuf
+        sys.modules["framebuf"] = emu_framebuf
+    try:
+        import micropython  # noqa: F401
+    except ImportError:
+        import emu_micropython
+        sys.modules["micropython"] = emu_micropython
+    # The unix port ships a machine module without I2C; always replace it
+    import emu_machine
+    import emu_network
+    sys.modules["machine"] = emu_machine
+    sys.modules["network"] = emu_network
+
+
+def load_firmware(fresh=False, virtual_clock=False, quiet=False, data_dir=None):
+    """Import main_time against the emulator without running main().
+    fresh=True re-imports it, for a clean set of module globals.
+    virtual_clock=True gives it (and the emulated network) a VirtualClock,
+    quiet=True silences its print(), and data_dir moves the files it
+    writes (state.bin, wifi.json) out of the current directory."""
+    install()
+    if fresh:
+        sys.modules.pop("main_time", None)
+    import main_time
+    import emu_network
+    if virtual_clock:
+        main_time.time = VirtualClock()
+    emu_network.clock = main_time.time
+    if quiet:
+        main_time.print = lambda *args, **kwargs: None
+    if data_dir is not None:
+        main_time.STATE_FILE = data_dir + "/state.bin"
+        main_time.WIFI_CACHE_FILE = data_dir + "/wifi.json"
+    return main_time
+
+
+_temp_dirs = []
+
+
+def temp_dir():
+    """A new temporary directory, removed when the interpreter exits."""
+    import tempfile
+    d = tempfile.TemporaryDirectory(prefix="sonos-monitor-")
+    _temp_dirs.append(d)
+    return d.name
+
+
+def firmware(virtual_clock=True):
+    """A fresh, quiet firmware for the host tests, on a virtual clock and
+    with its data files in a temporary directory."""
+    return load_firmware(fresh=True, virtual_clock=virtual_clock, quiet=True,
+                         data_dir=temp_dir())
+
+
+def run_tests(namespace):
+    """Run a test module's test_* functions in name order; the __main__
+    entry point for runs without pytest (e.g. the MicroPython unix port)."""
+    for name, fn in sorted(namespace.items()):
+        if name.startswith("test_"):
+            fn()
+            print(name, "ok")
+
+
+class VirtualClock:
+    """Stand-in for the firmware's time module where sleeps return at once
+    and only advance the clock. load_firmware(virtual_clock=True) installs
+    one as the firmware's time module."""
+
+    def __init__(self, start=1767225600):  # 2026-01-01
+        self.t = float(start)
+
+    def time(self):
+        return self.t
+
+    def sleep(self, seconds):
+        self.t += seconds
+
+    def sleep_ms(self, ms):
+        self.t += ms / 1000
+
+    def ticks_ms(self):
+        return int(self.t * 1000)
+
+    def ticks_us(self):
+        return int(self.t * 1000000)
+
+    def ticks_diff(self, a, b):
+        return a - b
+
+    def ticks_add(self, a, b):
+        return a + b
+
+    def localtime(self, secs=None):
+        return time.gmtime(self.t if secs is None else secs)
+
+    def gmtime(self, secs=None):
+        return time.gmtime(self.t if secs is None else secs)
@@ -0,0 +1,91 @@
+# Pure-Python stand-in for MicroPython's framebuf (MONO_VLSB only), used
+# on CPython. Glyphs drawn by text() are placeholders, not the real font.
+
+MONO_VLSB = 0
+
+
+class FrameBuffer:
+    def __init__(self, buf, width, height, fmt):
+        if fmt != MONO_VLSB:
+            raise ValueError("only MONO_VLSB is emulated")
+        self._buf = buf
+        self._w = width
+        self._h = height
+
+    def fill(self, c):
+        v = 0xFF if c else 0x00
+        buf = self._buf
+        for i in range(len(buf)):
+            buf[i] = v
+
+    def pixel(self, x, y, c=None):
+        if not (0 <= x < self._w and 0 <= y < self._h):
+            return None
+        i = (y >> 3) * self._w + x
+        bit = 1 << (y & 7)
+        if c is None:
+            return 1 if self._buf[i] & bit else 0
+        if c:
+            self._buf[i] |= bit
+        else:
+            self._buf[i] &= ~bit & 0xFF
+
+    def fill_rect(self, x, y, w, h, c):
+        x0 = max(x, 0)
+        y0 = max(y, 0)
+        x1 = min(x + w, self._w)
+        y1 = min(y + h, self._h)
+        buf = self._buf
+        for yy in range(y0, y1):
+            row = (yy >> 3) * self._w
+            bit = 1 << (yy & 7)
+            for xx in range(x0, x1):
+                if c:
+                    buf[row + xx] |= bit
+                else:
+                    buf[row + xx] &= ~bit & 0xFF
+
+    def hline(self, x, y, w, c):
+        self.fill_rect(x, y, w, 1, c)
+
+    def vline(self, x, y, h, c):
+        self.fill_rect(x, y, 1, h, c)
+
+    def rect(self, x, y, w, h, c, f=False):
+        if f:
+            self.fill_rect(x, y, w, h, c)
+            return
+        self.hline(x, y, w, c)
+        self.hline(x, y + h - 1, w, c)
+        self.vline(x, y, h, c)
+        self.vline(x + w - 1, y, h, c)
+
+    def line(self, x0, y0, x1, y1, c):
+        dx = abs(x1 - x0)
+        dy = -abs(y1 - y0)
+        sx = 1 if x0 < x1 else -1
+        sy = 1 if y0 < y1 else -1
+        err = dx + dy
+        while True:
+            self.pixel(x0, y0, c)
+            if x0 == x1 and y0 == y1:
+                break
+            e2 = 2 * err
+            if e2 >= dy:
+                err += dy
+                x0 += sx
+            if e2 <= dx:
+                err += dx
+                y0 += sy
+
+    def text(self, s, x, y, c=1):
+        for i, ch in enumerate(s):
+            code = ord(ch)
+            if code == 32:
+                continue
+            # 7x7 placeholder glyph whose pattern depends on the character
+            for col in range(7):
+                bits = ((code * (col + 3)) ^ (code >> 1)) & 0x7F
+                for row in range(7):
+                    if bits & (1 << row):
+                        self.pixel(x + i * 8 + col, y + row, c)
@@ -0,0 +1,153 @@
+# Host stand-in for the parts of MicroPython's machine module used by the
+# monitor. The I2C bus counts transactions and bytes and feeds an SSD1306
+# model, so the panel contents can be checked after a flush.
+import time
+
+# SSD1306 commands that take arguments, and how many
+_CMD_ARGS = {
+    0x20: 1, 0x21: 2, 0x22: 2, 0x81: 1, 0x8D: 1, 0xA8: 1,
+    0xD3: 1, 0xD5: 1, 0xD9: 1, 0xDA: 1, 0xDB: 1,
+}
+
+
+class Panel:
+    def __init__(self, width=128, pages=8):
+        self.width = width
+        self.pages = pages
+        self.ram = bytearray(width * pages)
+        self.col_start = 0
+        self.col_end = width - 1
+        self.page_start = 0
+        self.page_end = pages - 1
+        self.col = 0
+        self.page = 0
+        self.on = False
+        self.contrast = 0xFF
+        self._cmd = None
+        self._args = []
+        self._need = 0
+
+    def command(self, b):
+        if self._need:
+            self._args.append(b)
+            self._need -= 1
+            if not self._need:
+                self._apply(self._cmd, self._args)
+            return
+        need = _CMD_ARGS.get(b, 0)
+        if need:
+            self._cmd = b
+            self._args = []
+            self._need = need
+        else:
+            self._apply(b, ())
+
+    def _apply(self, cmd, args):
+        if cmd == 0x21:
+            self.col_start, self.col_end = args
+            self.col = self.col_start
+        elif cmd == 0x22:
+            self.page_start, self.page_end = args
+            self.page = self.page_start
+        elif cmd == 0x81:
+            self.contrast = args[0]
+        elif cmd == 0xAE:
+            self.on = False
+        elif cmd == 0xAF:
+            self.on = True
+
+    def data(self, buf):
+        for b in buf:
+            self.ram[self.page * self.width + self.col] = b
+            self.col += 1
+            if self.col > self.col_end:
+                self.col = self.col_start
+                self.page += 1
+                if self.page > self.page_end:
+                    self.page = self.page_start
+
+    def feed(self, msg):
+        ctrl = msg[0]
+        if ctrl == 0x40:
+            self.data(msg[1:])
+        elif ctrl == 0x80:
+            # Single command per control byte, possibly repeated
+            for i in range(1, len(msg), 2):
+                self.command(msg[i])
+        elif ctrl == 0x00:
+            for b in msg[1:]:
+                self.command(b)
+
+
+class I2C:
+    def __init__(self, id, scl=None, sda=None, freq=400000):
+        self.freq = freq
+        self.panel = Panel()
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.transactions = 0
+        self.bytes = 0
+
+    def bus_time_us(self):
+        # Address byte + payload, 9 clocks per byte, plus start/stop
+        return (self.bytes * 9 + self.transactions * 2) * 1000000 // self.freq
+
+    def _write(self, data):
+        self.transactions += 1
+        self.bytes += len(data) + 1
+        self.panel.feed(data)
+
+    def writeto(self, addr, buf):
+        self._write(bytes(buf))
+
+    def writevto(self, addr, bufs):
+        self._write(b"".join(bytes(b) for b in bufs))
+
+
+class Pin:
+    IN = 0
+    OUT = 1
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_FALLING = 4
+    IRQ_RISING = 8
+
+    def __init__(self, id, mode=IN, pull=None, value=1):
+        self.id = id
+        self._value = value
+        self.handler = None
+
+    def value(self, v=None):
+        if v is None:
+            return self._value
+        self._value = v
+
+    def irq(self, handler=None, trigger=IRQ_FALLING, wake=None):
+        self.handler = handler
+
+
+class WDT:
+    def __init__(self, id=0, timeout=5000):
+        self.timeout = timeout
+        self.feeds = 0
+
+    def feed(self):
+        self.feeds += 1
+
+
+class RTC:
+    _datetime = (2000, 1, 1, 5, 0, 0, 0, 0)
+
+    def datetime(self, dt=None):
+        if dt is None:
+            return RTC._datetime
+        RTC._datetime = tuple(dt)
+
+
+def lightsleep(ms=None):
+    time.sleep((ms or 0) / 1000)
+
+
+def reset():
+    raise SystemExit("machine.reset()")
@@ -0,0 +1,80 @@
+# Host stand-in for MicroPython's network module (rp2 status codes).
+# Associations complete immediately unless `join_ms` is set; joining with
+# a BSSID other than the emulated AP's fails with STAT_NO_AP_FOUND.
+import time
+
+clock = time  # Replace with the firmware's clock when it is virtual
+
+STA_IF = 0
+AP_IF = 1
+
+STAT_IDLE = 0
+STAT_CONNECTING = 1
+STAT_GOT_IP = 3
+STAT_CONNECT_FAIL = -1
+STAT_NO_AP_FOUND = -2
+STAT_WRONG_PASSWORD = -3
+
+
+class WLAN:
+    join_ms = 0
+    reports_bssid = False    # Whether config("bssid") works, as on some ports
+    bssid = b"\x02\x00\x00\x00\x00\x01"
+    channel = 6
+
+    def __init__(self, interface=STA_IF):
+        self._active = False
+        self._ssid = None
+        self._joined_at = None
+        self._no_ap = False
+        self.scans = 0
+        self._ifconfig = ("192.168.86.50", "255.255.255.0",
+                          "192.168.86.1", "192.168.86.1")
+
+    def active(self, state=None):
+        if state is None:
+            return self._active
+        self._active = state
+
+    def connect(self, ssid, key=None, bssid=None):
+        self._ssid = ssid
+        self._no_ap = bssid is not None and bytes(bssid) != self.bssid
+        self._joined_at = clock.ticks_add(clock.ticks_ms(), self.join_ms)
+
+    def disconnect(self):
+        self._joined_at = None
+        self._no_ap = False
+
+    def status(self, param=None):
+        if param == "rssi":
+            return -55
+        if self._joined_at is None:
+            return STAT_IDLE
+        if self._no_ap:
+            return STAT_NO_AP_FOUND
+        if clock.ticks_diff(clock.ticks_ms(), self._joined_at) >= 0:
+            return STAT_GOT_IP
+        return STAT_CONNECTING
+
+    def isconnected(self):
+        return self.status() == STAT_GOT_IP
+
+    def ifconfig(self, config=None):
+        if config is None:
+            return self._ifconfig
+        if config != "dhcp":
+            self._ifconfig = tuple(config)
+
+    def scan(self):
+        self.scans += 1
+        ssid = (self._ssid or "emulated").encode()
+        return [(ssid, self.bssid, self.channel, -55, 3, 0)]
+
+    def config(self, *args, **kwargs):
+        if args == ("mac",):
+            return b"\x02\x00\x00\x00\x00\x02"
+        if args == ("bssid",):
+            if not self.reports_bssid:
+                raise ValueError("unknown config param")
+            return self.bssid if self.isconnected() else None
+        return None
@@ -0,0 +1,182 @@
+# Live viewer for the display mirror in main_time.py (MIRROR_HOST).
+#
+#   python3 host/mirror_viewer.py                        watch live
+#   python3 host/mirror_viewer.py --record session.bin   watch and record
+#   python3 host/mirror_viewer.py --replay session.bin --speed 4
+#
+# Each packet carries whole pages (8 rows x 128 columns), RLE-encoded, so a
+# lost packet only leaves its pages stale until they change again or the
+# next keyframe arrives. Recordings store every packet with its arrival
+# time and replay through the same decoder.
+import argparse
+import socket
+import struct
+import sys
+import time
+
+# Keep in sync with the DISPLAY MIRROR section of main_time.py
+MAGIC = b"SF"
+VERSION = 1
+FLAG_KEYFRAME = 0x01
+HEADER_FMT = "!2sBBH"        # magic, version, flags, seq
+HEADER_SIZE = struct.calcsize(HEADER_FMT)
+RECORD_FMT = "!dH"           # arrival time, packet length
+RECORD_SIZE = struct.calcsize(RECORD_FMT)
+
+DEFAULT_PORT = 4612
+WIDTH = 128
+HEIGHT = 64
+PAGES = HEIGHT // 8
+
+
+def unrle(data, size):
+    """Decode one page; the inverse of rle_page() in main_time.py."""
+    out = bytearray()
+    i = 0
+    while i < len(data):
+        n = data[i]
+        if n < 128:
+            out += data[i + 1:i + n + 2]
+            i += n + 2
+        else:
+            out += bytes((data[i + 1],)) * (n - 125)
+            i += 2
+    if len(out) != size:
+        raise ValueError("page decodes to {} bytes, expected {}".format(len(out), size))
+    return out
+
+
+class Mirror:
+    """Reassembles the monitor's framebuffer from mirror packets."""
+
+    def __init__(self):
+        self.buf = bytearray(WIDTH * PAGES)
+        self.synced = False      # Seen a keyframe yet
+        self.seq = None
+        self.packets = 0
+        self.keyframes = 0
+        self.lost = 0
+        self.bytes = 0
+
+    def apply(self, pkt):
+        """Apply one packet. Returns False if it was not a mirror packet."""
+        if len(pkt) < HEADER_SIZE:
+            return False
+        magic, version, flags, seq = struct.unpack_from(HEADER_FMT, pkt)
+        if magic != MAGIC or version != VERSION:
+            return False
+        if self.seq is not None:
+            gap = (seq - self.seq - 1) & 0xFFFF
+            if gap < 0x8000:
+                self.lost += gap
+        self.seq = seq
+        self.packets += 1
+        self.bytes += len(pkt)
+        if flags & FLAG_KEYFRAME:
+            self.keyframes += 1
+            self.synced = True
+        i = HEADER_SIZE
+        while i + 2 <= len(pkt):
+            page, size = pkt[i], pkt[i + 1]
+            data = pkt[i + 2:i + 2 + size]
+            i += 2 + size
+            if page < PAGES:
+                self.buf[page * WIDTH:(page + 1) * WIDTH] = unrle(data, WIDTH)
+        return True
+
+    def pixel(self, x, y):
+        return (self.buf[(y >> 3) * WIDTH + x] >> (y & 7)) & 1
+
+    def render(self):
+        """The frame as text, two pixel rows per line."""
+        chars = " ▀▄█"
+        lines = []
+        for y in range(0, HEIGHT, 2):
+            lines.append("".join(
+                chars[self.pixel(x, y) | (self.pixel(x, y + 1) << 1)] for x in range(WIDTH)))
+        return "\n".join(lines)
+
+    def status(self):
+        return "seq {}  packets {}  keyframes {}  lost {}  {:.1f} B/packet{}".format(
+            self.seq, self.packets, self.keyframes, self.lost,
+            self.bytes / self.packets if self.packets else 0.0,
+            "" if self.synced else "  (waiting for keyframe)")
+
+
+def draw(mirror):
+    # Home the cursor and redraw in place
+    sys.stdout.write("\x1b[H" + mirror.render() + "\n" + mirror.status() + "\x1b[K\n")
+    sys.stdout.flush()
+
+
+def live(port, record):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("0.0.0.0", port))
+    out = open(record, "wb") if record else None
+    mirror = Mirror()
+    sys.stdout.write("\x1b[2J")
+    try:
+        while True:
+            pkt, addr = sock.recvfrom(2048)
+            if out:
+                out.write(struct.pack(RECORD_FMT, time.time(), len(pkt)) + pkt)
+                out.flush()
+            if mirror.apply(pkt):
+                draw(mirror)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if out:
+            out.close()
+
+
+def read_recording(path):
+    with open(path, "rb") as f:
+        while True:
+            head = f.read(RECORD_SIZE)
+            if len(head) < RECORD_SIZE:
+                return
+            t, size = struct.unpack(RECORD_FMT, head)
+            yield t, f.read(size)
+
+
+def replay(path, speed):
+    mirror = Mirror()
+    sys.stdout.write("\x1b[2J")
+    start = None
+    began = time.monotonic()
+    try:
+        for t, pkt in read_recording(path):
+            if start is None:
+                start = t
+            if speed > 0:
+                delay = (t - start) / speed - (time.monotonic() - began)
+                if delay > 0:
+                    time.sleep(delay)
+            if mirror.apply(pkt):
+                draw(mirror)
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="View the monitor's mirrored display")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT,
+                        help="UDP port to listen on (MIRROR_PORT)")
+    parser.add_argument("--record", metavar="FILE",
+                        help="also save received packets to FILE")
+    parser.add_argument("--replay", metavar="FILE",
+                        help="play back a recording instead of listening")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="replay speed multiplier, 0 for as fast as possible")
+    args = parser.parse_args()
+
+    if args.replay:
+        replay(args.replay, args.speed)
+    else:
+        live(args.port, args.record)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+# Power model for main_time.py, run on the host emulator in simulated time.
+#
+#   python3 host/power.py                  compare LOW_POWER_IDLE off/on
+#   python3 host/power.py --hours 4 --change-every 600
+#
+# The firmware's main loop runs against a virtual clock: sleeps advance
+# it instantly, SOAP calls cost a fixed active time, and I2C traffic costs
+# its bus time. Each slice of time is charged at the current draw for the
+# CPU, radio and panel state the firmware is in. The draw figures below
+# are rough Pico W + SSD1306 numbers at 5 V; replace them with bench
+# measurements for a real unit.
+import argparse
+import sys
+import time as host_time
+
+import emu
+
+SUPPLY_V = 5.0
+CURRENT_MA = {
+    "cpu_active": 25.0,
+    "cpu_idle": 15.0,        # time.sleep (WFE)
+    "cpu_lightsleep": 1.5,
+    "radio_performance": 25.0,
+    "radio_powersave": 2.5,
+    "radio_tx": 70.0,        # During a SOAP round-trip
+    "panel_bright": 10.0,
+    "panel_dim": 2.0,
+    "panel_off": 0.01,
+}
+SOAP_ACTIVE_MS = 25          # Per request, CPU and radio busy
+PS_WAKE_MS = 100             # Extra request latency with radio power-save
+LOOP_ACTIVE_MS = 1           # Python work per loop iteration
+BOOT_EPOCH = 1767225600      # 2026-01-01
+TRACK_SECONDS = 240          # Scripted track length, played on repeat
+
+
+class StopSimulation(BaseException):
+    pass
+
+
+class Simulation:
+    def __init__(self, hours, change_every, low_power):
+        self.end = hours * 3600
+        self.change_every = change_every
+        self.low_power = low_power
+        self.t = 0.0
+        self.energy_mws = 0.0
+        self.seconds = {"cpu_active": 0.0, "cpu_idle": 0.0, "cpu_lightsleep": 0.0}
+        self.shown = []          # (t, vol) each time the speaker state is drawn
+        self.bus_us = 0
+        self.fw = None
+
+    # Virtual clock ---------------------------------------------------------
+    def advance(self, seconds, cpu):
+        fw = self.fw
+        # Charge I2C traffic since the last advance as active time first
+        bus_us = fw.i2c.bus_time_us()
+        if bus_us > self.bus_us and cpu != "cpu_active":
+            self.advance((bus_us - self.bus_us) / 1e6, "cpu_active")
+        self.bus_us = fw.i2c.bus_time_us()
+
+        if cpu == "radio_tx":
+            cpu_key, radio_key = "cpu_active", "radio_tx"
+        else:
+            cpu_key = cpu
+            radio_key = "radio_powersave" if fw.radio_power_save else "radio_performance"
+        if not fw.display_on:
+            panel_key = "panel_off"
+        else:
+            panel_key = "panel_dim" if fw.is_dimmed else "panel_bright"
+        ma = CURRENT_MA[cpu_key] + CURRENT_MA[radio_key] + CURRENT_MA[panel_key]
+        self.energy_mws += ma * SUPPLY_V * seconds
+        self.seconds[cpu_key] += seconds
+        self.t += seconds
+        if self.t >= self.end:
+            raise StopSimulation
+
+    def sleep(self, seconds):
+        self.advance(LOOP_ACTIVE_MS / 1000, "cpu_active")
+        self.advance(seconds, "cpu_idle")
+
+    def lightsleep(self, ms):
+        self.advance(LOOP_ACTIVE_MS / 1000, "cpu_active")
+        self.advance(ms / 1000, "cpu_lightsleep")
+
+    # Scripted speaker ------------------------------------------------------
+    def speaker_volume(self):
+        return 20 + int(self.t // self.change_every) % 10
+
+    def soap(self):
+        if self.fw.radio_power_save:
+            # Waiting for the radio's next wake window
+            self.advance(PS_WAKE_MS / 1000, "cpu_idle")
+        self.advance(SOAP_ACTIVE_MS / 1000, "radio_tx")
+
+    def get_volume(self, ip, group=False):
+        self.soap()
+        return self.speaker_volume()
+
+    def get_mute(self, ip, group=False):
+        self.soap()
+        return False
+
+    def get_position(self, ip):
+        self.soap()  # GetPositionInfo
+        self.soap()  # GetTransportInfo
+        return int(self.t % TRACK_SECONDS * 1000), TRACK_SECONDS * 1000, True
+
+    # Wiring ----------------------------------------------------------------
+    def load(self):
+        sys.modules.pop("main_time", None)
+        fw = emu.load_firmware(data_dir=emu.temp_dir())
+        sim = self
+
+        class SimTime:
+            def time(self):
+                return BOOT_EPOCH + sim.t
+
+            def sleep(self, seconds):
+                sim.sleep(seconds)
+
+            def sleep_ms(self, ms):
+                sim.sleep(ms / 1000)
+
+            def ticks_ms(self):
+                return int(sim.t * 1000)
+
+            def ticks_us(self):
+                return int(sim.t * 1000000)
+
+            def ticks_diff(self, a, b):
+                return a - b
+
+            def ticks_add(self, a, b):
+                return a + b
+
+            def localtime(self, secs=None):
+                return host_time.gmtime(self.time() if secs is None else secs)
+
+            def gmtime(self, secs=None):
+                return host_time.gmtime(self.time() if secs is None else secs)
+
+        fw.time = SimTime()
+        fw.lightsleep = self.lightsleep
+        fw.get_volume = self.get_volume
+        fw.get_mute = self.get_mute
+        fw.get_position = self.get_position
+        fw.sync_ntp = lambda: True
+        fw.DUAL_CORE = False
+        fw.FOLLOW_GROUP = False
+        fw.LOW_POWER_IDLE = self.low_power
+        fw.print = lambda *args, **kwargs: None
+        show = fw.show_speaker_state
+
+        def show_speaker_state(vol, mute):
+            sim.shown.append((sim.t, vol))
+            show(vol, mute)
+
+        fw.show_speaker_state = show_speaker_state
+        self.fw = fw
+        self.bus_us = fw.i2c.bus_time_us()
+
+    def latencies(self):
+        """Seconds from each scripted volume change to it being drawn."""
+        out = []
+        change = self.change_every
+        while change < self.t:
+            vol = 20 + int(change // self.change_every) % 10
+            for t, shown in self.shown:
+                if t >= change and shown == vol:
+                    out.append(t - change)
+                    break
+            change += self.change_every
+        return out
+
+    def run(self):
+        self.load()
+        try:
+            self.fw.main()
+        except StopSimulation:
+            pass
+        hours = self.t / 3600
+        total = sum(self.seconds.values())
+        lat = self.latencies()
+        return {
+            "duty_cycle": self.seconds["cpu_active"] / total,
+            "lightsleep": self.seconds["cpu_lightsleep"] / total,
+            "mwh_per_hour": self.energy_mws / 3600 / hours,
+            "avg_ma": self.energy_mws / SUPPLY_V / self.t,
+            "latency_avg": sum(lat) / len(lat) if lat else 0.0,
+            "latency_max": max(lat) if lat else 0.0,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estimate monitor power draw")
+    parser.add_argument("--hours", type=float, default=2.0)
+    parser.add_argument("--change-every", type=float, default=1800,
+                        help="seconds between simulated volume changes")
+    args = parser.parse_args()
+
+    print("{:16} {:>8} {:>11} {:>9} {:>8} {:>12} {:>12}".format(
+        "mode", "duty", "lightsleep", "mWh/h", "avg mA", "latency avg", "latency max"))
+    for low_power in (False, True):
+        r = Simulation(args.hours, args.change_every, low_power).run()
+        print("{:16} {:>7.2%} {:>10.1%} {:>9.1f} {:>8.1f} {:>11.2f}s {:>11.2f}s".format(
+            "low-power idle" if low_power else "always on",
+            r["duty_cycle"], r["lightsleep"], r["mwh_per_hour"], r["avg_ma"],
+            r["latency_avg"], r["latency_max"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# Boot display checks on the emulator: a saved speaker state must reach
+# the panel before the (blocking) network init starts and stay there
+# through a quiet init, and a failed init must not hold up the main loop.
+#
+#   python3 -m pytest host/test_boot.py
+#   python3 host/test_boot.py
+import emu
+
+
+def test_restored_state_reaches_panel():
+    fw = emu.firmware()
+    with open(fw.STATE_FILE, "wb") as f:
+        f.write(fw.pack_state(42, False, fw.time.time()))
+    panel = fw.i2c.panel
+
+    assert fw.restore_state() == (42, False)
+    assert any(panel.ram), "restored frame never sent"
+    assert panel.ram == fw.frames.front_buf
+    shown = bytes(panel.ram)
+
+    fw.sync_ntp = lambda: True
+    assert fw.init_system(quiet=True)
+    assert bytes(panel.ram) == shown
+
+
+def test_no_saved_state_leaves_panel_alone():
+    fw = emu.firmware()
+    assert fw.restore_state() is None
+    assert not any(fw.i2c.panel.ram)
+
+
+class Stop(BaseException):
+    pass
+
+
+def test_failed_init_with_saved_state_enters_loop():
+    fw = emu.firmware()
+    with open(fw.STATE_FILE, "wb") as f:
+        f.write(fw.pack_state(42, False, fw.time.time()))
+    fw.DUAL_CORE = False
+    fw.FOLLOW_GROUP = False
+    fw.SHOW_PROGRESS = False
+    wlan = fw.wifi.wlan
+    wlan.join_ms = 10 ** 9  # The AP is down at boot
+    fw.get_volume = lambda ip, group=False: 30 if wlan.isconnected() else None
+    fw.get_mute = lambda ip, group=False: False
+    fw.sync_ntp = lambda: True
+    clock = fw.time
+    fw.lightsleep = lambda ms: clock.sleep(ms / 1000)
+    sleep = clock.sleep
+    start = clock.t
+    seen = {}
+
+    def watched_sleep(seconds):
+        sleep(seconds)
+        elapsed = clock.t - start
+        if elapsed > 120 and "error" not in seen:
+            seen["error"] = fw.speaker_error
+            seen["feeds"] = fw.wdt.feeds
+            wlan.join_ms = 0  # The AP comes back
+        if elapsed > 600:
+            raise Stop
+
+    clock.sleep = watched_sleep
+    try:
+        fw.main()
+    except Stop:
+        pass
+    # The outage ended on the error screen, with the watchdog fed
+    assert seen["error"]
+    assert seen["feeds"] > 0
+    # and the loop picked the speaker up once the link was back
+    assert not fw.speaker_error and not fw.state_stale
+    assert fw.last_vol == 30
+
+
+if __name__ == "__main__":
+    emu.run_tests(globals())
@@ -0,0 +1,74 @@
+# Speaker-down handling on a virtual clock: core 1 keeps its heartbeat
+# while the breaker holds requests back, and a WiFi outage ends on an
+# error instead of the last volume staying up.
+#
+#   python3 -m pytest host/test_breaker.py
+#   python3 host/test_breaker.py
+import emu
+
+
+class Stop(BaseException):
+    pass
+
+
+def firmware():
+    fw = emu.firmware()
+    fw.wifi.connect()
+    return fw
+
+
+def test_worker_heartbeat_while_breaker_open():
+    fw = firmware()
+    fw.get_volume = lambda ip, group=False: None  # Speaker unplugged
+    fw.FOLLOW_GROUP = False
+    mb = fw.StateMailbox()
+    clock = fw.time
+    end = clock.t + 600
+    sleep = clock.sleep
+    worst = [0.0]
+
+    def watched_sleep(seconds):
+        sleep(seconds)
+        # Core 0's view: would it stop feeding the watchdog?
+        assert not mb.stalled(clock.t), "core 1 looked stalled"
+        worst[0] = max(worst[0], clock.t - mb.last_beat)
+        if clock.t > end:
+            raise Stop
+
+    clock.sleep = watched_sleep
+    try:
+        fw.network_worker(mb)
+    except Stop:
+        pass
+    assert fw.breaker.backoff_ms == fw.BREAKER_MAX_MS  # Reached full backoff
+    assert worst[0] <= fw.POLL_INTERVAL
+
+
+def test_wifi_outage_opens_breaker():
+    fw = firmware()
+    fw.get_volume = lambda ip, group=False: 30
+    fw.get_mute = lambda ip, group=False: False
+    fw.FOLLOW_GROUP = False
+    fw.SHOW_PROGRESS = False
+
+    def poll():
+        fw.time.sleep(fw.poll_wait())
+        return fw.poll_speaker()
+
+    assert poll() == (30, False)
+
+    fw.wifi.wlan.disconnect()
+    fw.wifi.wlan.join_ms = 10 ** 9  # Reconnects never complete
+    for _ in range(fw.BREAKER_THRESHOLD):
+        assert poll() == (None, False)
+    assert fw.speaker_down()
+
+    # Link back: the speaker is probed at once, not after the backoff
+    fw.wifi.wlan.join_ms = 0
+    fw.wifi.wlan.connect(fw.WIFI_SSID, fw.WIFI_PASS)
+    assert poll() == (30, False)
+    assert not fw.speaker_down()
+
+
+if __name__ == "__main__":
+    emu.run_tests(globals())
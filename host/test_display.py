@@ -0,0 +1,123 @@
+# Double-buffered display checks on the emulator: a paged flush never
+# mixes frames on the panel, a frame presented mid-flush waits its turn,
+# each pass of the main loop sends at most one step of pages, and the
+# progress bar costs a few bytes a second.
+#
+#   python3 -m pytest host/test_display.py
+#   python3 host/test_display.py
+import emu
+
+# One page of data plus the window command block, at 400 kHz
+PAGE_STALL_US = 3500
+
+
+def page(buf, p, width):
+    return bytes(buf[p * width:(p + 1) * width])
+
+
+def flush_checked(fw, prev):
+    """Step the flush out, checking the panel after every step. Each page
+    must show either the frame in flight (if already sent) or the last
+    complete frame. Returns the frame left on the panel."""
+    frames = fw.frames
+    d = fw.oled
+    panel = fw.i2c.panel
+    while True:
+        if frames.next_page >= d.pages:
+            # The pending frame swaps in now; the one on the panel is complete
+            prev = bytes(frames.front_buf)
+        more = frames.step()
+        for p in range(d.pages):
+            want = frames.front_buf if p < frames.next_page else prev
+            assert page(panel.ram, p, d.width) == page(want, p, d.width), \
+                "page {} torn".format(p)
+        if not more:
+            return bytes(frames.front_buf)
+
+
+def test_paged_flush_never_tears():
+    fw = emu.firmware()
+    fw.show_volume(11)
+    fw.frames.flush()
+    shown = bytes(fw.i2c.panel.ram)
+    assert shown == bytes(fw.frames.front_buf)
+
+    fw.show_volume(22)  # Presents; not busy, so it swaps in at once
+    b = bytes(fw.frames.front_buf)
+    fw.frames.step()
+    # Drawn and presented while 22 is still going out
+    fw.show_volume(33)
+    fw.show_muted(44)
+    assert fw.frames.pending
+    assert bytes(fw.frames.front_buf) == b
+
+    final = flush_checked(fw, shown)
+    assert bytes(fw.i2c.panel.ram) == final
+    assert final != b  # The last frame presented wins
+
+
+def test_loop_sends_one_step_per_pass():
+    fw = emu.firmware()
+    bus = fw.i2c
+    fw.show_volume(88)
+    passes = 0
+    worst = 0
+    while fw.frames.busy():
+        before = bus.bus_time_us()
+        fw.loop_sleep(0)
+        worst = max(worst, bus.bus_time_us() - before)
+        passes += 1
+    steps = -(-fw.oled.pages // fw.FLUSH_PAGES_PER_STEP)
+    assert passes == steps
+    assert worst <= PAGE_STALL_US * fw.FLUSH_PAGES_PER_STEP, worst
+    assert bus.panel.ram == fw.frames.front_buf
+
+
+def test_paged_flush_sets_window_once():
+    fw = emu.firmware()
+    bus = fw.i2c
+    fw.show_volume(12)
+    fw.frames.flush()
+    fw.show_volume(34)
+    bus.reset_counters()
+    fw.frames.flush()
+    # One window command block, then data only
+    assert bus.transactions == 1 + fw.oled.pages // fw.FLUSH_PAGES_PER_STEP
+
+
+def play(fw, seconds, step=0.1):
+    """Run the bar for seconds of loop passes. Returns I2C bytes sent."""
+    bus = fw.i2c
+    bus.reset_counters()
+    for _ in range(int(seconds / step)):
+        fw.time.sleep(step)
+        fw.update_progress_bar()
+    return bus.bytes
+
+
+def test_progress_bar_traffic():
+    fw = emu.firmware()
+    fw.progress.update(0, 240 * 1000, True)  # A four-minute track
+    fw.show_change(30, False)
+    fw.frames.flush()
+    assert fw.progress_shown
+
+    rate = play(fw, 60) / 60
+    assert 0 < rate < 10, rate  # Bytes per second
+    assert fw.i2c.panel.ram == fw.frames.front_buf
+
+    # Paused: the bar holds still and nothing is sent
+    fw.progress.update(fw.progress.position_ms(), 240 * 1000, False)
+    assert play(fw, 30) == 0
+
+    # A small seek back clears only the columns past the new position
+    cols = fw.bar_cols
+    fw.progress.update(fw.progress.position_ms() - 5000, 240 * 1000, False)
+    sent = play(fw, 1)
+    assert fw.bar_cols < cols
+    assert sent < fw.oled.width // 4, sent
+    assert fw.i2c.panel.ram == fw.frames.front_buf
+
+
+if __name__ == "__main__":
+    emu.run_tests(globals())
@@ -0,0 +1,101 @@
+# Seqlock stress test for StateMailbox: a _thread writer publishes records
+# whose fields are all derived from one counter, and the reader checks
+# every snapshot it accepts is internally consistent. Runs under CPython
+# and the MicroPython unix port:
+#
+#   python3 -m pytest host/test_mailbox.py
+#   micropython host/test_mailbox.py
+import sys
+import time
+
+import _thread
+
+import emu
+
+fw = emu.load_firmware(fresh=True, quiet=True)
+
+READS = 300                  # Accepted snapshots to check per run
+TIME_LIMIT = 30              # Seconds
+
+
+def consistent(snap):
+    vol = snap[fw.MB_VOL]
+    if snap[fw.MB_MUTE] != vol & 1:
+        return False
+    if snap[fw.MB_WIFI] != (vol >> 1) & 1:
+        return False
+    if snap[fw.MB_BREAKER] != vol % 3:
+        return False
+    if snap[fw.MB_TRACK_PLAYING] != snap[fw.MB_TRACK_REL] & 1:
+        return False
+    return snap[fw.MB_TRACK_DUR] == 2 * snap[fw.MB_TRACK_REL]
+
+
+def writer(mb, stop, done):
+    n = 0
+    while not stop:
+        n += 1
+        fw.breaker.state = n % 3
+        mb.publish(n, n & 1, (n >> 1) & 1)
+        mb.publish_position(n, 2 * n, n & 1)
+    done.append(n)
+
+
+def stress(mb):
+    """Returns (accepted reads, inconsistent reads, records published)"""
+    stop = []
+    done = []
+    if hasattr(sys, "setswitchinterval"):
+        # Make CPython switch threads as often as it can
+        old = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+    try:
+        _thread.start_new_thread(writer, (mb, stop, done))
+        accepted = torn = 0
+        started = time.time()
+        while accepted < READS and time.time() - started < TIME_LIMIT:
+            if mb.read():
+                accepted += 1
+                if not consistent(mb.snap):
+                    torn += 1
+        stop.append(True)
+        while not done:
+            time.sleep(0.001)
+    finally:
+        if hasattr(sys, "setswitchinterval"):
+            sys.setswitchinterval(old)
+    return accepted, torn, done[0]
+
+
+def test_no_torn_reads():
+    mb = fw.StateMailbox()
+    accepted, torn, published = stress(mb)
+    assert torn == 0, "{} of {} reads were torn".format(torn, accepted)
+    assert accepted == READS
+    # The last record is always readable once the writer is done
+    mb.last_seq = -1
+    assert mb.read() and mb.snap[fw.MB_VOL] == published
+
+
+class UnlockedMailbox(fw.StateMailbox):
+    """Reader that ignores the sequence number, to show the test can fail"""
+
+    def read(self):
+        for i in range(1, fw.MB_SIZE):
+            self.snap[i] = self.slots[i]
+        return True
+
+
+def test_detects_torn_reads_without_seqlock():
+    if not hasattr(sys, "setswitchinterval"):
+        return  # Switch points are too coarse on the unix port to rely on
+    started = time.time()
+    while time.time() - started < 10:
+        accepted, torn, published = stress(UnlockedMailbox())
+        if torn:
+            return
+    assert False, "unlocked reader never tore; the stress test has no teeth"
+
+
+if __name__ == "__main__":
+    emu.run_tests(globals())
@@ -0,0 +1,77 @@
+# Display mirror checks: the RLE page encoding round-trips through the
+# viewer's decoder, the viewer rebuilds exactly what the panel shows, and
+# comparing frames allocates no page copies.
+#
+#   python3 -m pytest host/test_mirror.py
+#   python3 host/test_mirror.py
+import random
+import socket
+
+import emu
+import mirror_viewer
+
+
+def test_rle_round_trip():
+    fw = emu.firmware(virtual_clock=False)
+    rng = random.Random(35)
+    for _ in range(500):
+        choices = (0, 0, 0, 0xFF, 0x70, rng.randrange(256))
+        page = bytearray(rng.choice(choices) for _ in range(128))
+        out = bytearray()
+        fw.rle_page(page, 0, 128, out)
+        assert len(out) <= 129
+        assert mirror_viewer.unrle(out, 128) == page
+
+
+def test_viewer_tracks_panel():
+    fw = emu.firmware(virtual_clock=False)
+    rx = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    rx.bind(("127.0.0.1", 0))
+    fw.MIRROR_HOST = "127.0.0.1"
+    fw.MIRROR_PORT = rx.getsockname()[1]
+    fw.start_mirror()
+    viewer = mirror_viewer.Mirror()
+
+    def drain():
+        rx.setblocking(False)
+        try:
+            while True:
+                assert viewer.apply(rx.recv(2048))
+        except BlockingIOError:
+            pass
+
+    for vol in (42, 43, 7):
+        fw.show_volume(vol)
+        fw.frames.flush()
+        drain()
+        assert viewer.buf == fw.frames.front_buf
+        assert viewer.buf == fw.i2c.panel.ram
+    assert viewer.keyframes == 1 and viewer.lost == 0
+    rx.close()
+
+
+class NoSlices(bytearray):
+    """A frame buffer that fails the test if any of it is copied out"""
+
+    def __getitem__(self, i):
+        assert not isinstance(i, slice), "frame buffer sliced"
+        return bytearray.__getitem__(self, i)
+
+
+def test_frame_compare_makes_no_page_copies():
+    fw = emu.firmware(virtual_clock=False)
+    sent = []
+    mirror = fw.FrameMirror("127.0.0.1", 9, fw.oled.width, fw.oled.pages)
+    mirror._send = lambda buf, pages, keyframe: sent.append(list(pages))
+    front = NoSlices(fw.frames.front_buf)
+    prev = NoSlices(front)
+    mirror.frame(front, prev)
+    assert sent == []
+
+    prev[3 * fw.oled.width + 5] ^= 1
+    mirror.frame(front, prev)
+    assert sent == [[3]]
+
+
+if __name__ == "__main__":
+    emu.run_tests(globals())
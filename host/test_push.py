@@ -0,0 +1,148 @@
+# Push mode over loopback UDP: host/aggregator.py publishing to the
+# firmware's PushReceiver. Covers the unicast subscription, the sequence
+# and staleness rules, and two players sharing one multicast group.
+#
+#   python3 -m pytest host/test_push.py
+#   python3 host/test_push.py
+import socket
+import time as host_time
+
+import aggregator
+import emu
+
+LIVING = "192.168.86.40"   # SONOS_IP
+KITCHEN = "192.168.86.41"
+
+
+def player(ip, room, volume):
+    p = aggregator.Player(ip, room)
+    p.volume = volume
+    p.ok = True
+    return p
+
+
+def receiver(**config):
+    """A firmware PushReceiver on an ephemeral loopback port. Returns
+    (fw, receiver)."""
+    fw = emu.firmware()
+    fw.time.t = host_time.time()  # Packets carry host time
+    fw.PUSH_PORT = 0
+    for name, value in config.items():
+        setattr(fw, name, value)
+    return fw, fw.PushReceiver()
+
+
+def aggregate(*players, multicast=None):
+    agg = aggregator.Aggregator(list(players), port=0, multicast=multicast, event_port=None)
+    agg.sock.settimeout(1)
+    return agg
+
+
+def port_of(sock):
+    return sock.getsockname()[1]
+
+
+def receive(push, wait=1.0):
+    """poll() until something arrives or wait seconds pass"""
+    deadline = host_time.monotonic() + wait
+    while True:
+        result = push.poll()
+        if result is not None or host_time.monotonic() > deadline:
+            return result
+        host_time.sleep(0.01)
+
+
+def send(push, pkt):
+    """Deliver a raw packet to the receiver"""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.sendto(pkt, ("127.0.0.1", port_of(push.sock)))
+
+
+def test_subscribe_gets_current_state():
+    living = player(LIVING, "Living", 25)
+    agg = aggregate(living)
+    fw, push = receiver(AGGREGATOR_IP="127.0.0.1", AGGREGATOR_PORT=port_of(agg.sock))
+
+    assert push.poll() is None  # Sends the subscription
+    data, addr = agg.sock.recvfrom(64)
+    agg.subscribe(data, addr)
+    assert agg.subscribers[addr][0] == LIVING
+    assert receive(push) == (25, False)
+
+    living.volume, living.mute = 30, True
+    agg.publish(living)
+    assert receive(push) == (30, True)
+
+    living.ok = False  # The aggregator lost the speaker
+    agg.publish(living)
+    assert receive(push) == (None, False)
+
+
+def test_old_and_repeated_packets_dropped():
+    living = player(LIVING, "Living", 20)
+    fw, push = receiver()
+    first = living.packet(1)
+    living.volume = 21
+    second = living.packet(1)
+
+    send(push, second)
+    assert receive(push) == (21, False)
+    send(push, second)  # Duplicate
+    send(push, first)   # Reordered
+    assert receive(push, wait=0.2) is None
+    assert push.dropped == 2
+
+    # A restarted aggregator (new session) starts its sequence over
+    living.seq = 0
+    living.volume = 22
+    send(push, living.packet(2))
+    assert receive(push) == (22, False)
+
+
+def test_stale_feed_accepts_any_sequence():
+    living = player(LIVING, "Living", 20)
+    fw, push = receiver()
+    living.seq = 100
+    send(push, living.packet(1))
+    assert receive(push) == (20, False)
+    assert not push.stale(fw.time.time())
+
+    fw.time.sleep(fw.PUSH_STALE_SECONDS + 1)
+    assert push.stale(fw.time.time())
+    living.seq = 0  # Same session, but the gap resets the sequence check
+    living.volume = 23
+    send(push, living.packet(1))
+    assert receive(push) == (23, False)
+    assert not push.stale(fw.time.time())
+
+
+def test_shared_group_keeps_own_player():
+    living = player(LIVING, "Living", 20)
+    kitchen = player(KITCHEN, "Kitchen", 40)
+    fw, push = receiver()
+    # Loopback stands in for the multicast group: every packet the
+    # aggregator sends to the group reaches this receiver
+    agg = aggregate(living, kitchen, multicast="127.0.0.1")
+    agg.push_port = port_of(push.sock)
+
+    # The kitchen's sequence runs well ahead of the living room's
+    kitchen.seq = 1000
+    for vol in range(21, 26):
+        living.volume = vol
+        kitchen.volume = 40 + vol
+        agg.publish(kitchen)
+        agg.publish(living)
+        agg.publish(kitchen)
+        assert receive(push) == (vol, False)
+    assert push.seq == living.seq
+    assert push.dropped == 0
+
+    # A feed carrying only other players' packets goes stale
+    fw.time.sleep(fw.PUSH_STALE_SECONDS + 1)
+    agg.publish(kitchen)
+    assert receive(push, wait=0.2) is None
+    assert push.stale(fw.time.time())
+
+
+if __name__ == "__main__":
+    emu.run_tests(globals())
@@ -0,0 +1,103 @@
+# Idle timers on a virtual clock: the panel powers off DISPLAY_OFF_AFTER
+# after the last change, even when that deadline lands on a time display
+# or periodic reinits run in between, and stays on while the speaker
+# keeps changing.
+#
+#   python3 -m pytest host/test_timers.py
+#   python3 host/test_timers.py
+import emu
+
+
+def firmware():
+    fw = emu.firmware()
+    fw.start_timers()
+    fw.show_change(30, False)
+    return fw
+
+
+def idle_until_off(fw, limit_s):
+    """Run the scheduler a second at a time until the panel is off.
+    Returns the seconds it took, or None if it stayed on."""
+    started = fw.time.time()
+    while fw.time.time() - started < limit_s:
+        fw.time.sleep(1)
+        fw.sched.run()
+        if not fw.i2c.panel.on:
+            return fw.time.time() - started
+    return None
+
+
+def test_panel_off_after_idle():
+    fw = firmware()
+    # The default timeout lands on a time display tick
+    assert fw.DISPLAY_OFF_AFTER % fw.TIME_DISPLAY_INTERVAL == 0
+    took = idle_until_off(fw, 2 * 3600)
+    assert took is not None, "panel never powered off"
+    assert fw.DISPLAY_OFF_AFTER <= took <= fw.DISPLAY_OFF_AFTER + fw.TIME_DISPLAY_DURATION + 1
+    assert not fw.display_on and not fw.showing_time
+
+
+def test_panel_off_during_time_display():
+    fw = firmware()
+    # The clock tick lands just ahead of the off deadline
+    fw.sched.restart(fw.clock_timer)
+    fw.time.sleep(0.001)
+    fw.sched.restart(fw.off_timer)
+    took = idle_until_off(fw, 2 * 3600)
+    assert took is not None, "panel never powered off"
+    assert took <= fw.DISPLAY_OFF_AFTER + fw.TIME_DISPLAY_DURATION + 1
+
+
+def test_panel_off_between_time_displays():
+    fw = firmware()
+    fw.off_timer[1] = 930 * 1000
+    fw.note_activity()
+    assert 930 <= idle_until_off(fw, 2 * 3600) < 931
+
+
+def test_changes_keep_panel_on():
+    fw = firmware()
+    for vol in range(10):
+        assert idle_until_off(fw, fw.DISPLAY_OFF_AFTER - 60) is None
+        fw.show_change(vol, False)
+    assert fw.i2c.panel.on
+
+
+class Stop(BaseException):
+    pass
+
+
+def test_main_loop_powers_off_through_reinits():
+    fw = emu.firmware()
+    fw.DUAL_CORE = False
+    fw.FOLLOW_GROUP = False
+    fw.SHOW_PROGRESS = False
+    fw.get_volume = lambda ip, group=False: 30
+    fw.get_mute = lambda ip, group=False: False
+    fw.sync_ntp = lambda: True
+    clock = fw.time
+    fw.lightsleep = lambda ms: clock.sleep(ms / 1000)
+    sleep = clock.sleep
+    off_at = []
+
+    def watched_sleep(seconds):
+        sleep(seconds)
+        if not off_at and not fw.i2c.panel.on:
+            off_at.append(clock.t)
+        if clock.t - start > 2 * 3600:
+            raise Stop
+
+    start = clock.t
+    clock.sleep = watched_sleep
+    try:
+        fw.main()
+    except Stop:
+        pass
+    # Several periodic reinits ran in that time; none of them woke it
+    assert off_at, "panel never powered off"
+    assert off_at[0] - start < fw.DISPLAY_OFF_AFTER + 60
+    assert not fw.i2c.panel.on
+
+
+if __name__ == "__main__":
+    emu.run_tests(globals())
@@ -0,0 +1,76 @@
+# WifiManager against the emulated network module on a virtual clock:
+# reconnects found by the non-blocking watcher never scan, the cached AP
+# gives a fast reconnect, and a stale cached AP falls back to a full
+# connect.
+#
+#   python3 -m pytest host/test_wifi.py
+#   python3 host/test_wifi.py
+import emu
+
+OTHER_AP = "020000000099"
+
+
+def reconnect(fw, limit_s=30):
+    """Drop the link and run the watcher until it is back. Returns the
+    seconds it took."""
+    wifi = fw.wifi
+    wifi.wlan.disconnect()
+    started = fw.time.time()
+    while not wifi.poll():
+        fw.time.sleep(fw.WIFI_POLL_INTERVAL)
+        assert fw.time.time() - started < limit_s, "never reconnected"
+    return fw.time.time() - started
+
+
+def test_first_connect_learns_ap_by_scan():
+    fw = emu.firmware()
+    wlan = fw.wifi.wlan
+    assert fw.wifi.connect()
+    assert wlan.scans == 1
+    assert fw.load_wifi_cache()["bssid"] == wlan.bssid.hex()
+
+
+def test_fast_reconnect_uses_cached_ap():
+    fw = emu.firmware()
+    wifi = fw.wifi
+    assert wifi.connect()
+    wifi.wlan.join_ms = 300
+    took = reconnect(fw)
+    assert wifi.fast_reconnects == 1
+    assert took < 1
+    assert wifi.wlan.scans == 1  # Only the first connect scanned
+
+
+def test_stale_cached_ap_falls_back_without_scanning():
+    fw = emu.firmware()
+    wifi = fw.wifi
+    assert wifi.connect()
+    wifi.cache["bssid"] = OTHER_AP  # The AP was replaced
+    took = reconnect(fw)
+    assert wifi.fast_reconnects == 0
+    assert took < fw.WIFI_FAST_TIMEOUT_MS / 1000 + 1
+    # The watcher must not block on a scan; it is deferred
+    assert wifi.wlan.scans == 1
+    assert wifi.scan_pending
+
+    # The next blocking connect (init or reinit) learns the AP
+    assert wifi.connect()
+    assert wifi.wlan.scans == 2
+    assert not wifi.scan_pending
+    assert wifi.cache["bssid"] == wifi.wlan.bssid.hex()
+
+
+def test_connected_bssid_replaces_scan():
+    fw = emu.firmware()
+    wifi = fw.wifi
+    wifi.wlan.reports_bssid = True
+    assert wifi.connect()
+    wifi.cache["bssid"] = OTHER_AP
+    reconnect(fw)
+    assert wifi.wlan.scans == 0
+    assert not wifi.scan_pending
+    assert wifi.cache["bssid"] == wifi.wlan.bssid.hex()
+
+
+if __name__ == "__main__":
+    emu.run_tests(globals())
@@ -0,0 +1,380 @@
+# Zone group checks against a fake Sonos household: with SONOS_IP in a
+# group of 1, 2 or 3 players, every refresh reads the group volume and
+# mute from the coordinator (one GetGroupVolume and one GetGroupMute), the
+# group ID is re-read on topology events (or on a timer without them),
+# and ZoneGroupState is only fetched again when that ID changes. The push
+# aggregator follows the group the same way, so both modes agree.
+#
+#   python3 -m pytest host/test_zones.py
+#   python3 host/test_zones.py
+import http.client
+import socket
+import threading
+
+import aggregator
+import emu
+
+PLAYERS = {
+    "192.168.86.40": "RINCON_A",
+    "192.168.86.41": "RINCON_B",
+    "192.168.86.42": "RINCON_C",
+}
+VOLUMES = {"RINCON_A": 20, "RINCON_B": 30, "RINCON_C": 40}
+
+
+def escape(text):
+    return (text.replace("&", "&amp;").replace("<", "&lt;")
+            .replace(">", "&gt;").replace('"', "&quot;"))
+
+
+class Household:
+    """Answers soap_call() the way a set of Sonos players would. Groups
+    list player UUIDs with the coordinator first; each regroup gets new
+    group IDs, as on real players."""
+
+    def __init__(self, groups, events=True):
+        self.calls = []
+        self.generation = 0
+        self.events = events     # Accept event subscriptions
+        self.sid = None
+        self.down = set()        # Player IPs not answering
+        self.regroup(groups)
+
+    def regroup(self, groups):
+        self.groups = groups
+        self.generation += 1
+
+    def ip(self, uuid):
+        for ip, player in PLAYERS.items():
+            if player == uuid:
+                return ip
+
+    def group_of(self, uuid):
+        for group in self.groups:
+            if uuid in group:
+                return group
+
+    def group_id(self, group):
+        return "{}:{}".format(group[0], self.generation)
+
+    def zone_group_state(self):
+        xml = "<ZoneGroupState><ZoneGroups>"
+        for group in self.groups:
+            xml += '<ZoneGroup Coordinator="{}" ID="{}">'.format(group[0], self.group_id(group))
+            for uuid in sorted(group):
+                xml += ('<ZoneGroupMember UUID="{}" Location="http://{}:1400/xml/'
+                        'device_description.xml" ZoneName="{}"/>').format(uuid, self.ip(uuid), uuid)
+            xml += "</ZoneGroup>"
+        return xml + "</ZoneGroups></ZoneGroupState>"
+
+    def subscribe(self, ip, request):
+        self.calls.append((ip, "SUBSCRIBE"))
+        if not self.events:
+            return b"HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\n\r\n"
+        if b"\r\nSID:" not in request:
+            self.sid = "uuid:{}_sub{:010d}".format(PLAYERS[ip], len(self.calls))
+        return ("HTTP/1.1 200 OK\r\nSID: {}\r\nTIMEOUT: Second-1800\r\n"
+                "Content-Length: 0\r\n\r\n").format(self.sid).encode()
+
+    def notify(self, fw, refresh_fn=None):
+        """Send a topology NOTIFY to the firmware's listener, as a player
+        does on any topology change. The listener answers during the next
+        refresh, which this runs. Returns that refresh's result."""
+        body = "<e:propertyset><e:property><ZoneGroupState>{}</ZoneGroupState></e:property></e:propertyset>".format(
+            escape(self.zone_group_state())).encode()
+        head = ("NOTIFY /zgt HTTP/1.1\r\nHOST: 127.0.0.1:{}\r\nCONTENT-TYPE: text/xml\r\n"
+                "NT: upnp:event\r\nNTS: upnp:propchange\r\nSID: {}\r\nSEQ: {}\r\n"
+                "CONTENT-LENGTH: {}\r\n\r\n").format(fw.EVENT_PORT, self.sid, self.generation, len(body))
+        with socket.create_connection(("127.0.0.1", fw.EVENT_PORT), timeout=2) as conn:
+            conn.sendall(head.encode() + body)
+            result = refresh_fn() if refresh_fn else refresh(fw, self)
+            assert conn.recv(64).startswith(b"HTTP/1.1 200")
+        return result
+
+    def soap_call(self, ip, request, max_chunks=20):
+        if request.startswith(b"SUBSCRIBE"):
+            return self.subscribe(ip, request)
+        action = request.split(b"#")[1].split(b'"')[0].decode()
+        self.calls.append((ip, action))
+        me = PLAYERS[ip]
+        group = self.group_of(me)
+        if ip in self.down:
+            raise OSError("host unreachable")
+        if action == "GetZoneGroupAttributes":
+            body = ("<CurrentZoneGroupID>{}</CurrentZoneGroupID>"
+                    "<CurrentZonePlayerUUIDsInGroup>{}</CurrentZonePlayerUUIDsInGroup>").format(
+                        self.group_id(group), ",".join(group))
+        elif action == "GetZoneGroupState":
+            body = "<ZoneGroupState>{}</ZoneGroupState>".format(escape(self.zone_group_state()))
+        elif action in ("GetGroupVolume", "GetGroupMute") and group[0] != me:
+            body = "<s:Fault/>"  # Group queries only work on the coordinator
+        elif action == "GetGroupVolume":
+            body = "<CurrentVolume>{}</CurrentVolume>".format(self.group_volume(group))
+        elif action == "GetVolume":
+            body = "<CurrentVolume>{}</CurrentVolume>".format(VOLUMES[me])
+        else:
+            body = "<CurrentMute>0</CurrentMute>"
+        return body.encode()
+
+    def group_volume(self, group):
+        return sum(VOLUMES[uuid] for uuid in group) // len(group)
+
+    def count(self, action):
+        return sum(1 for ip, name in self.calls if name == action)
+
+
+def group_with(size):
+    """SONOS_IP (RINCON_A) in a group of size players, coordinated by the
+    last one added so grouped queries have to be redirected."""
+    members = ["RINCON_A", "RINCON_B", "RINCON_C"][:size]
+    rest = [[uuid] for uuid in PLAYERS.values() if uuid not in members]
+    return [members[-1:] + members[:-1]] + rest
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("0.0.0.0", 0))
+        return s.getsockname()[1]
+
+
+def firmware(groups, events=True):
+    fw = emu.firmware()
+    fw.EVENT_PORT = free_port()
+    house = Household(groups, events)
+    fw.soap_call = house.soap_call
+    return fw, house
+
+
+def aggregated(house, ip="192.168.86.40", events=True):
+    """An aggregator Player talking to the household. Returns (player,
+    event server)."""
+    player = aggregator.Player(ip, "Living")
+
+    def request(method, path, body=None, headers=None, ip=None):
+        soap = "SOAPACTION: {}".format(headers["SOAPACTION"]).encode()
+        return house.soap_call(ip or player.ip, soap).decode()
+
+    def subscribe(headers):
+        reply = house.subscribe(player.ip, "".join(
+            "\r\n{}: {}".format(k, v) for k, v in headers.items()).encode())
+        status, head = reply.split(b"\r\n\r\n")[0].split(b"\r\n", 1)
+        fields = dict(line.decode().split(": ", 1) for line in head.split(b"\r\n"))
+        return int(status.split()[1]), fields.get("SID"), fields.get("TIMEOUT")
+
+    player._request = request
+    player._subscribe = subscribe
+    agg = aggregator.Aggregator([player], port=0, event_port=0 if events else None)
+    agg.sock.close()
+    if agg.events:
+        threading.Thread(target=agg.events.serve_forever, daemon=True).start()
+        player.subscribe("http://127.0.0.1:{}/zgt".format(agg.events.server_address[1]))
+    return player, agg.events
+
+
+def refresh(fw, house):
+    start = len(house.calls)
+    vol, mute = fw.fetch_speaker()
+    return vol, house.calls[start:]
+
+
+def next_check(fw):
+    fw.time.sleep(fw.TOPOLOGY_CHECK_INTERVAL + 1)
+
+
+GROUP_READS = ["GetGroupVolume", "GetGroupMute"]
+
+
+def check_refresh_reads_coordinator(size):
+    fw, house = firmware(group_with(size))
+    group = house.group_of("RINCON_A")
+    coordinator = house.ip(group[0])
+
+    refresh(fw, house)  # Learns the group and subscribes
+    assert fw.topology.coordinator == coordinator
+    assert fw.topology.events.live()
+    for _ in range(5):
+        vol, calls = refresh(fw, house)
+        assert vol == house.group_volume(group) // 2  # parse_volume() halves it
+        assert calls == [(coordinator, action) for action in GROUP_READS], calls
+        fw.time.sleep(fw.TOPOLOGY_CHECK_INTERVAL)  # No timed checks with events
+
+
+def check_events_drive_checks(size):
+    fw, house = firmware(group_with(size))
+    refresh(fw, house)
+    fetched = house.count("GetZoneGroupState")
+    assert fetched == (size > 1)  # A player on its own is its coordinator
+
+    # An event for something else (another room's volume, an update
+    # check) re-reads the ID but not the topology
+    vol, calls = house.notify(fw)
+    assert calls[0] == (fw.SONOS_IP, "GetZoneGroupAttributes")
+    assert house.count("GetZoneGroupState") == fetched
+
+    # Regroup: the event makes the very next refresh follow it
+    new_size = size % 3 + 1
+    house.regroup(group_with(new_size))
+    vol, calls = house.notify(fw)
+    coordinator = house.ip(house.group_of("RINCON_A")[0])
+    assert house.count("GetZoneGroupState") == fetched + (new_size > 1)
+    assert fw.topology.coordinator == coordinator
+    assert calls[-2:] == [(coordinator, action) for action in GROUP_READS], calls
+    assert vol == house.group_volume(house.group_of("RINCON_A")) // 2
+
+
+def check_state_refetched_on_group_change_polling(size):
+    fw, house = firmware(group_with(size), events=False)
+    refresh(fw, house)
+    assert house.count("GetZoneGroupAttributes") == 1
+    fetched = house.count("GetZoneGroupState")
+    assert fetched == (size > 1)
+    assert not fw.topology.events.live()
+
+    # Same group: the ID is re-read at every check, the topology is not
+    for _ in range(3):
+        next_check(fw)
+        vol, calls = refresh(fw, house)
+        assert (fw.SONOS_IP, "GetZoneGroupAttributes") in calls
+        assert house.count("GetZoneGroupState") == fetched
+
+    # Between checks nothing but the group reads go out
+    vol, calls = refresh(fw, house)
+    assert [action for ip, action in calls] == GROUP_READS, calls
+
+    # Regroup into the next size up (3 wraps to 1); the new ID is noticed at
+    # the next check and only then is the topology fetched again
+    new_size = size % 3 + 1
+    house.regroup(group_with(new_size))
+    next_check(fw)
+    refresh(fw, house)
+    assert house.count("GetZoneGroupState") == fetched + (new_size > 1)
+    coordinator = house.ip(house.group_of("RINCON_A")[0])
+    assert fw.topology.coordinator == coordinator
+    vol, calls = refresh(fw, house)
+    assert calls == [(coordinator, action) for action in GROUP_READS], calls
+
+
+def test_refresh_reads_coordinator_1_player():
+    check_refresh_reads_coordinator(1)
+
+
+def test_refresh_reads_coordinator_2_players():
+    check_refresh_reads_coordinator(2)
+
+
+def test_refresh_reads_coordinator_3_players():
+    check_refresh_reads_coordinator(3)
+
+
+def test_events_drive_checks_1_player():
+    check_events_drive_checks(1)
+
+
+def test_events_drive_checks_2_players():
+    check_events_drive_checks(2)
+
+
+def test_events_drive_checks_3_players():
+    check_events_drive_checks(3)
+
+
+def test_state_refetched_on_group_change_polling_1_player():
+    check_state_refetched_on_group_change_polling(1)
+
+
+def test_state_refetched_on_group_change_polling_2_players():
+    check_state_refetched_on_group_change_polling(2)
+
+
+def test_state_refetched_on_group_change_polling_3_players():
+    check_state_refetched_on_group_change_polling(3)
+
+
+def test_coordinator_moving_between_checks():
+    fw, house = firmware(group_with(2), events=False)
+    refresh(fw, house)
+    fetched = house.count("GetZoneGroupState")
+
+    # B hands the group to A with no check in between: B faults, and the
+    # next refresh re-reads the ID and looks the group up again
+    house.regroup([["RINCON_A", "RINCON_B"], ["RINCON_C"]])
+    vol, calls = refresh(fw, house)
+    assert vol is None
+    refresh(fw, house)
+    assert house.count("GetZoneGroupState") == fetched + 1
+    assert fw.topology.coordinator == fw.SONOS_IP
+
+
+def test_probe_after_outage_reads_group_volume():
+    fw, house = firmware(group_with(2))
+    group = house.group_of("RINCON_A")
+    coordinator = house.ip(group[0])
+    refresh(fw, house)
+
+    # The coordinator drops off until the breaker opens
+    house.down.add(coordinator)
+    while not fw.speaker_down():
+        refresh(fw, house)
+    house.down.clear()
+
+    # The half-open probe asks the cached coordinator for the group
+    # volume; the player's own volume would read differently and redraw
+    fw.time.sleep(fw.breaker.backoff_ms / 1000)
+    assert fw.breaker.allow()
+    start = len(house.calls)
+    vol, mute = fw.fetch_speaker()
+    assert vol == house.group_volume(group) // 2
+    assert (fw.SONOS_IP, "GetVolume") not in house.calls[start:]
+    assert not fw.speaker_down()
+
+
+def test_aggregator_matches_polling():
+    for size in (1, 2, 3):
+        fw, house = firmware(group_with(size))
+        player, events = aggregated(house)
+        group = house.group_of("RINCON_A")
+        for _ in range(3):
+            vol, calls = refresh(fw, house)
+            player.poll()
+            assert player.ok and player.volume == vol == house.group_volume(group) // 2
+        assert player.coordinator == fw.topology.coordinator
+        events.shutdown()
+
+
+def test_aggregator_follows_topology_events():
+    house = Household(group_with(1))
+    player, events = aggregated(house)
+    assert player.events_live()
+    player.poll()
+    assert player.coordinator == player.ip
+
+    # Without an event the group isn't re-read, even past the timer
+    house.regroup(group_with(3))
+    player.checked_at -= aggregator.TOPOLOGY_CHECK_INTERVAL + 1
+    player.poll()
+    assert house.count("GetZoneGroupAttributes") == 1
+
+    conn = http.client.HTTPConnection("127.0.0.1", events.server_address[1], timeout=2)
+    conn.request("NOTIFY", "/zgt", b"<e:propertyset/>", {"SID": house.sid, "NT": "upnp:event"})
+    assert conn.getresponse().status == 200
+    conn.close()
+    assert player.recheck
+    player.poll()
+    assert player.coordinator == house.ip(house.group_of("RINCON_A")[0])
+    assert player.volume == house.group_volume(house.group_of("RINCON_A")) // 2
+    events.shutdown()
+
+
+def test_aggregator_polls_group_without_events():
+    house = Household(group_with(1), events=False)
+    player, events = aggregated(house)
+    assert not player.events_live()
+    player.poll()
+    house.regroup(group_with(2))
+    player.checked_at -= aggregator.TOPOLOGY_CHECK_INTERVAL + 1
+    player.poll()
+    assert player.coordinator == house.ip(house.group_of("RINCON_A")[0])
+
+
+if __name__ == "__main__":
+    emu.run_tests(globals())
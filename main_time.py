@@ -2,9 +2,23 @@ import network
 import socket
 import time
 import gc
-from machine import Pin, I2C, WDT
+import json
+import random
+import struct
+from array import array
+from machine import Pin, I2C, WDT, RTC
 import ssd1306
 
+try:
+    from machine import lightsleep
+except ImportError:
+    lightsleep = None
+
+try:
+    import _thread
+except ImportError:
+    _thread = None
+
 # ============================================================
 # CONFIG
 # ============================================================
@@ -12,6 +26,38 @@ WIFI_SSID = "googlewifi"
 WIFI_PASS = "9ksecbj9"
 SONOS_IP = "192.168.86.40"
 
+# WiFi reconnect
+WIFI_CACHE_FILE = "wifi.json"  # Last good BSSID/channel/lease
+WIFI_STATIC_IP = None        # (ip, mask, gateway, dns) to skip DHCP, or None
+WIFI_REUSE_LEASE = False     # Reuse the cached DHCP lease as a static config
+WIFI_FAST_TIMEOUT_MS = 3000  # Give up on the cached AP after this long
+WIFI_CONNECT_TIMEOUT_MS = 10000
+WIFI_POLL_INTERVAL = 0.05
+
+# Circuit breaker for an unreachable speaker
+BREAKER_THRESHOLD = 3        # Consecutive failures before opening
+BREAKER_BASE_MS = 2000       # First backoff while open
+BREAKER_MAX_MS = 60000       # Backoff cap
+
+# Speaker groups
+FOLLOW_GROUP = True          # Show group volume when SONOS_IP is grouped
+TOPOLOGY_EVENTS = True       # Re-check the group on topology change events
+EVENT_PORT = 3500            # Local port the speaker sends event NOTIFYs to
+TOPOLOGY_EVENT_TIMEOUT = 1800  # Event subscription length to ask for, renewed at half
+TOPOLOGY_CHECK_INTERVAL = 30 # Without events, check SONOS_IP's group ID this often
+
+# Push mode: take speaker state from host/aggregator.py instead of polling.
+# Enabled when AGGREGATOR_IP or PUSH_GROUP is set.
+AGGREGATOR_IP = None         # Host running the aggregator (unicast)
+AGGREGATOR_PORT = 4610
+PUSH_PORT = 4611             # Local port state packets arrive on
+PUSH_GROUP = None            # Multicast group to join, e.g. "239.255.46.10"
+SONOS_ROOM = None            # Only accept packets for this room, or None
+PUSH_SUBSCRIBE_INTERVAL = 30 # Renew the unicast subscription this often
+PUSH_STALE_SECONDS = 5       # Fall back to polling after this long without packets
+PUSH_TICK = 0.05             # Receive check period while push is live
+PUSH_TIME_SLEW = 2           # Set the RTC from packets drifting more than this
+
 TIMEZONE_OFFSET = -5  # UTC-5 (EST/CDT)
 
 # Timing constants (in seconds)
@@ -19,9 +65,41 @@ DIM_AFTER_SECONDS = 30       # Dim after 30 seconds of no changes
 TIME_DISPLAY_INTERVAL = 60   # Show time every 60 seconds
 TIME_DISPLAY_DURATION = 5    # Show time for 5 seconds
 REINIT_INTERVAL = 300       # Re-init every 5 minutes
+INIT_RETRY = 30              # Retry a failed boot init this soon (saved state shown)
 MIN_STATUS_DISPLAY = 0.25    # Minimum time to show status screens
-GC_INTERVAL = 30             # Garbage collect every 30 seconds
+GC_INTERVAL = 30             # Garbage collect every 30 seconds, in the next idle slot
+GC_THRESHOLD_MIN = 4096      # Floor for the tuned gc.threshold() backstop
+GC_PAUSE_BUCKETS_MS = (1, 2, 5, 10, 20, 50)  # Pause histogram bucket edges
 WATCHDOG_TIMEOUT = 8000      # Watchdog timeout in ms (max 8388ms on RP2040)
+POLL_INTERVAL = 0.5          # Time between Sonos polls
+BUTTON_DEBOUNCE_MS = 500
+
+# Dual-core mode: network I/O runs on core 1, core 0 renders and reads input
+DUAL_CORE = True             # Falls back to single-core if _thread is missing
+CORE0_TICK = 0.05            # Core 0 loop period in dual-core mode
+FLUSH_PAGES_PER_STEP = 1     # Display pages sent between input/poll checks
+WORKER_STALL_SECONDS = 20    # Stop feeding the watchdog if core 1 goes quiet
+
+# Track progress bar under the volume
+SHOW_PROGRESS = True
+PROGRESS_SYNC_INTERVAL = 15  # Re-read the position from the speaker this often
+PROGRESS_PAGE = 7            # Bar sits in the bottom page (rows 56-63)
+BAR_ON = 0x70                # Column byte for elapsed time (rows 60-62)
+BAR_OFF = 0x40               # Column byte for the rest of the track (row 62)
+
+# Display mirroring to host/mirror_viewer.py (debug aid, off by default)
+MIRROR_HOST = None           # Viewer address, e.g. "192.168.86.20"
+MIRROR_PORT = 4612
+MIRROR_KEYFRAME_SECONDS = 10 # Resend every page this often so viewers can join
+
+# Saved state for instant display after a reset
+STATE_FILE = "state.bin"
+STATE_SAVE_DELAY = 10        # Coalesce changes for this long before a flash write
+STATE_FLASH_MIN_INTERVAL = 60  # Minimum time between flash writes
+
+# Low-power idle (single-core mode only; lightsleep would stall core 1)
+LOW_POWER_IDLE = True        # lightsleep and WiFi power-save while dimmed
+DISPLAY_OFF_AFTER = 900      # Power the panel off after this long without changes
 
 # Brightness levels
 BRIGHT = 255
@@ -33,6 +111,13 @@ TIME_X_OFFSET = -5    # Horizontal offset for time display
 
 # SOAP servicee
 SERVICE_TYPE = "urn:schemas-upnp-org:service:RenderingControl:1"
+RC_PATH = "/MediaRenderer/RenderingControl/Control"
+AVT_SERVICE = "urn:schemas-upnp-org:service:AVTransport:1"
+AVT_PATH = "/MediaRenderer/AVTransport/Control"
+GRC_SERVICE = "urn:schemas-upnp-org:service:GroupRenderingControl:1"
+GRC_PATH = "/MediaRenderer/GroupRenderingControl/Control"
+ZGT_SERVICE = "urn:schemas-upnp-org:service:ZoneGroupTopology:1"
+ZGT_PATH = "/ZoneGroupTopology/Control"
 
 SOAP_VOLUME = """<?xml version="1.0" encoding="utf-8"?>
 <s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/">
@@ -54,11 +139,63 @@ SOAP_MUTE = """<?xml version="1.0" encoding="utf-8"?>
   </s:Body>
 </s:Envelope>"""
 
+SOAP_POSITION = """<?xml version="1.0" encoding="utf-8"?>
+<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/">
+  <s:Body>
+    <u:GetPositionInfo xmlns:u="{}">
+      <InstanceID>0</InstanceID>
+    </u:GetPositionInfo>
+  </s:Body>
+</s:Envelope>"""
+
+SOAP_TRANSPORT_INFO = """<?xml version="1.0" encoding="utf-8"?>
+<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/">
+  <s:Body>
+    <u:GetTransportInfo xmlns:u="{}">
+      <InstanceID>0</InstanceID>
+    </u:GetTransportInfo>
+  </s:Body>
+</s:Envelope>"""
+
+SOAP_GROUP_VOLUME = """<?xml version="1.0" encoding="utf-8"?>
+<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/">
+  <s:Body>
+    <u:GetGroupVolume xmlns:u="{}">
+      <InstanceID>0</InstanceID>
+    </u:GetGroupVolume>
+  </s:Body>
+</s:Envelope>"""
+
+SOAP_GROUP_MUTE = """<?xml version="1.0" encoding="utf-8"?>
+<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/">
+  <s:Body>
+    <u:GetGroupMute xmlns:u="{}">
+      <InstanceID>0</InstanceID>
+    </u:GetGroupMute>
+  </s:Body>
+</s:Envelope>"""
+
+SOAP_ZONE_ATTRIBUTES = """<?xml version="1.0" encoding="utf-8"?>
+<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/">
+  <s:Body>
+    <u:GetZoneGroupAttributes xmlns:u="{}"></u:GetZoneGroupAttributes>
+  </s:Body>
+</s:Envelope>"""
+
+SOAP_ZONE_STATE = """<?xml version="1.0" encoding="utf-8"?>
+<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/">
+  <s:Body>
+    <u:GetZoneGroupState xmlns:u="{}"></u:GetZoneGroupState>
+  </s:Body>
+</s:Envelope>"""
+
 # ============================================================
 # HARDWARE SETUP
 # ============================================================
 i2c = I2C(0, scl=Pin(1), sda=Pin(0), freq=400000)
 oled = ssd1306.SSD1306_I2C(128, 64, i2c)
+frames = ssd1306.DoubleBuffer(oled, pages_per_step=FLUSH_PAGES_PER_STEP)
+fb_width = oled.width
 button = Pin(2, Pin.IN, Pin.PULL_UP)
 
 # ============================================================
@@ -66,15 +203,19 @@ button = Pin(2, Pin.IN, Pin.PULL_UP)
 # ============================================================
 last_vol = None
 last_mute = None
-last_change_time = 0
-last_time_shown = 0
-last_reinit_time = 0
-last_button_time = 0
-last_gc_time = 0
+last_button_time = None  # ticks_ms of the last accepted press
 is_dimmed = False
+display_on = True
+radio_power_save = False
+button_latched = False  # Set by the button IRQ, so presses during sleep count
 showing_time = False
-time_show_start = 0
 wdt = None  # Watchdog timer
+mailbox = None  # StateMailbox when the network worker runs on core 1
+push = None     # PushReceiver in push mode
+speaker_error = False  # Sonos error screen is showing
+state_stale = False    # Showing saved state from before the last reset
+progress_shown = False # Front buffer has the progress bar in it
+bar_cols = 0           # Bar columns currently lit on the panel
 
 # ============================================================
 # DIGIT BITMAPS
@@ -95,27 +236,94 @@ DIGITS = {
 # ============================================================
 # DRAWING HELPERS
 # ============================================================
-def draw_big_digit(x, y, digit, scale):
+def draw_big_digit(fb, x, y, digit, scale):
     bitmap = DIGITS[digit]
     for col, bits in enumerate(bitmap):
         for row in range(7):
             if bits & (1 << row):
-                oled.fill_rect(x + col * scale, y + row * scale, scale, scale, 1)
+                fb.fill_rect(x + col * scale, y + row * scale, scale, scale, 1)
+
+def draw_mute_icon(fb, x, y, scale=2):
+    fb.fill_rect(x, y + 3 * scale, 3 * scale, 4 * scale, 1)
+    fb.line(x + 3 * scale, y + 3 * scale, x + 6 * scale, y, 1)
+    fb.line(x + 3 * scale, y + 7 * scale, x + 6 * scale, y + 10 * scale, 1)
+    fb.line(x + 6 * scale, y, x + 6 * scale, y + 10 * scale, 1)
+    fb.line(x + 8 * scale, y, x + 14 * scale, y + 10 * scale, 1)
+    fb.line(x + 14 * scale, y, x + 8 * scale, y + 10 * scale, 1)
+
+def bar_columns():
+    """Lit progress bar columns, or -1 if there is no track to show"""
+    if not progress.duration_ms:
+        return -1
+    return progress.columns(fb_width)
+
+def fill_bar_row(buf, cols):
+    base = PROGRESS_PAGE * fb_width
+    for c in range(fb_width):
+        if cols < 0:
+            buf[base + c] = 0
+        else:
+            buf[base + c] = BAR_ON if c < cols else BAR_OFF
+
+def draw_progress_bar():
+    """Draw the progress bar into the back buffer. Returns False if disabled."""
+    global bar_cols
+    if not SHOW_PROGRESS:
+        return False
+    bar_cols = bar_columns()
+    fill_bar_row(frames.back_buf, bar_cols)
+    return True
+
+def update_progress_bar():
+    """
+    Move the bar on the panel without a full frame: only the columns that
+    changed are sent, usually a single data byte.
+    """
+    global bar_cols
+    if not progress_shown or not display_on or frames.busy():
+        return
+    cols = bar_columns()
+    if cols == bar_cols:
+        return
+    buf = frames.front_buf
+    base = PROGRESS_PAGE * fb_width
+    if bar_cols >= 0 and cols > bar_cols:
+        for c in range(bar_cols, cols):
+            buf[base + c] = BAR_ON
+        oled.show_columns(buf, PROGRESS_PAGE, bar_cols, cols - bar_cols)
+    elif cols >= 0 and bar_cols > cols:
+        # Seek backwards or a new track: turn off just the columns past it
+        for c in range(cols, bar_cols):
+            buf[base + c] = BAR_OFF
+        oled.show_columns(buf, PROGRESS_PAGE, cols, bar_cols - cols)
+    else:
+        # Track appeared or went away: resend the whole bar row
+        fill_bar_row(buf, cols)
+        oled.show_columns(buf, PROGRESS_PAGE, 0, fb_width)
+    bar_cols = cols
 
-def draw_mute_icon(x, y, scale=2):
-    oled.fill_rect(x, y + 3 * scale, 3 * scale, 4 * scale, 1)
-    oled.line(x + 3 * scale, y + 3 * scale, x + 6 * scale, y, 1)
-    oled.line(x + 3 * scale, y + 7 * scale, x + 6 * scale, y + 10 * scale, 1)
-    oled.line(x + 6 * scale, y, x + 6 * scale, y + 10 * scale, 1)
-    oled.line(x + 8 * scale, y, x + 14 * scale, y + 10 * scale, 1)
-    oled.line(x + 14 * scale, y, x + 8 * scale, y + 10 * scale, 1)
+def draw_stale_marker(fb):
+    """Small hollow box in the top-right corner: value is from before a reset"""
+    fb.rect(122, 1, 5, 5, 1)
 
 # ============================================================
 # DISPLAY SCREENS
 # ============================================================
+def present(wait=False, bar=False):
+    """
+    Queue the drawn frame. With wait=True, flush it before returning.
+    bar says whether the frame contains the progress bar.
+    """
+    global progress_shown
+    frames.present()
+    progress_shown = bar
+    if wait:
+        frames.flush()
+
 def show_volume(vol):
     """Display volume number centered on screen"""
-    oled.fill(0)
+    fb = frames.back
+    fb.fill(0)
     vol_str = str(vol)
     scale = 6
     digit_w = 5 * scale
@@ -125,14 +333,17 @@ def show_volume(vol):
     start_y = (64 - (7 * scale)) // 2
     
     for i, ch in enumerate(vol_str):
-        draw_big_digit(start_x + i * (digit_w + spacing), start_y, ch, scale)
+        draw_big_digit(fb, start_x + i * (digit_w + spacing), start_y, ch, scale)
     
-    oled.show()
+    if state_stale:
+        draw_stale_marker(fb)
+    present(bar=draw_progress_bar())
 
 def show_muted(vol):
     """Display mute icon with volume in corner"""
-    oled.fill(0)
-    draw_mute_icon(2, 2, scale=2)
+    fb = frames.back
+    fb.fill(0)
+    draw_mute_icon(fb, 2, 2, scale=2)
     
     vol_str = str(vol)
     scale = 6
@@ -143,13 +354,16 @@ def show_muted(vol):
     start_y = 64 - (7 * scale) - 1
     
     for i, ch in enumerate(vol_str):
-        draw_big_digit(start_x + i * (digit_w + spacing), start_y, ch, scale)
+        draw_big_digit(fb, start_x + i * (digit_w + spacing), start_y, ch, scale)
     
-    oled.show()
+    if state_stale:
+        draw_stale_marker(fb)
+    present()
 
 def show_time():
     """Display current time in 12-hour format"""
-    oled.fill(0)
+    fb = frames.back
+    fb.fill(0)
     t = time.localtime()
     h = (t[3] + TIMEZONE_OFFSET) % 24
     m = t[4]
@@ -180,82 +394,261 @@ def show_time():
     
     start_y = (64 - (7 * scale)) // 2
     
-    draw_big_digit(start_x, start_y, hh[0], scale)
+    draw_big_digit(fb, start_x, start_y, hh[0], scale)
     x_pos = start_x + digit_w + spacing
     
     if len(hh) == 2:
-        draw_big_digit(x_pos, start_y, hh[1], scale)
+        draw_big_digit(fb, x_pos, start_y, hh[1], scale)
         colon_x = x_pos + digit_w + spacing + 2
     else:
         colon_x = x_pos + 2
     
-    oled.fill_rect(colon_x, start_y + 6, 2, 2, 1)
-    oled.fill_rect(colon_x, start_y + 20, 2, 2, 1)
+    fb.fill_rect(colon_x, start_y + 6, 2, 2, 1)
+    fb.fill_rect(colon_x, start_y + 20, 2, 2, 1)
     
     mm_x = colon_x + 6
-    draw_big_digit(mm_x, start_y, mm[0], scale)
-    draw_big_digit(mm_x + digit_w + spacing, start_y, mm[1], scale)
+    draw_big_digit(fb, mm_x, start_y, mm[0], scale)
+    draw_big_digit(fb, mm_x + digit_w + spacing, start_y, mm[1], scale)
     
-    oled.show()
+    present()
 
 def show_status(line1, line2=""):
     """Display status message (for init screens)"""
-    oled.fill(0)
-    oled.text(line1, 0, 20)
+    fb = frames.back
+    fb.fill(0)
+    fb.text(line1, 0, 20)
     if line2:
-        oled.text(line2, 0, 36)
-    oled.show()
+        fb.text(line2, 0, 36)
+    present(wait=True)
 
 def show_error(error_type):
     """Display error screen"""
-    oled.fill(0)
+    fb = frames.back
+    fb.fill(0)
     if error_type == "wifi":
-        oled.text("WiFi Error", 20, 20)
-        oled.text("Not Connected", 10, 36)
+        fb.text("WiFi Error", 20, 20)
+        fb.text("Not Connected", 10, 36)
     elif error_type == "wifi_timeout":
-        oled.text("WiFi Timeout", 15, 20)
-        oled.text("Retrying...", 20, 36)
+        fb.text("WiFi Timeout", 15, 20)
+        fb.text("Retrying...", 20, 36)
     elif error_type == "ntp":
-        oled.text("NTP Error", 25, 20)
-        oled.text("Time Sync Fail", 5, 36)
+        fb.text("NTP Error", 25, 20)
+        fb.text("Time Sync Fail", 5, 36)
     elif error_type == "sonos":
-        oled.text("Sonos Error", 20, 20)
-        oled.text("Not Responding", 5, 36)
+        fb.text("Sonos Error", 20, 20)
+        fb.text("Not Responding", 5, 36)
     else:
-        oled.text("Error", 40, 20)
-        oled.text(str(error_type)[:16], 0, 36)
-    oled.show()
+        fb.text("Error", 40, 20)
+        fb.text(str(error_type)[:16], 0, 36)
+    present(wait=True)
 
 def show_speaker_state(vol, mute):
-    """Show current speaker state (volume or muted)"""
+    """Show current speaker state (volume or muted) and save it for the next boot"""
     if mute:
         show_muted(vol)
     else:
         show_volume(vol)
+    state_store.update(vol, mute)
+
+# ============================================================
+# DISPLAY MIRROR
+# ============================================================
+# Keep in sync with host/mirror_viewer.py
+MIRROR_MAGIC = b"SF"
+MIRROR_VERSION = 1
+MIRROR_FLAG_KEYFRAME = 0x01
+
+def rle_page(buf, start, n, out):
+    """
+    PackBits-style encode buf[start:start + n] onto out. A header byte
+    below 128 is followed by that many + 1 literal bytes; 128 and up
+    repeats the next byte (header - 125) times.
+    """
+    i = start
+    end = start + n
+    while i < end:
+        v = buf[i]
+        j = i + 1
+        while j < end and buf[j] == v and j - i < 130:
+            j += 1
+        if j - i >= 3:
+            out.append(125 + j - i)
+            out.append(v)
+            i = j
+            continue
+        # Literal run up to the next run of 3 or 128 bytes
+        j = i
+        while j < end and j - i < 128 and not (
+                j + 2 < end and buf[j] == buf[j + 1] == buf[j + 2]):
+            j += 1
+        out.append(j - i - 1)
+        while i < j:
+            out.append(buf[i])
+            i += 1
+
+def page_differs(a, b, start, n):
+    """Compare n bytes of two buffers in place, without slicing copies"""
+    for i in range(start, start + n):
+        if a[i] != b[i]:
+            return True
+    return False
+
+class FrameMirror:
+    """
+    Streams the display to a host viewer over UDP. Each packet holds the
+    RLE-encoded pages that changed since the previous frame, with a
+    sequence number; every MIRROR_KEYFRAME_SECONDS all pages are sent.
+    Works from the buffers the display already has, so no frame copies.
+    """
+    def __init__(self, host, port, width, pages):
+        self.addr = (host, port)
+        self.width = width
+        self.pages = pages
+        self.seq = 0
+        self.last_keyframe = time.time()
+        self.sent = 0
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+
+    def _send(self, buf, pages, keyframe):
+        self.seq = (self.seq + 1) & 0xFFFF
+        out = bytearray(MIRROR_MAGIC)
+        out.append(MIRROR_VERSION)
+        out.append(MIRROR_FLAG_KEYFRAME if keyframe else 0)
+        out.append(self.seq >> 8)
+        out.append(self.seq & 0xFF)
+        for page in pages:
+            out.append(page)
+            size_at = len(out)
+            out.append(0)
+            rle_page(buf, page * self.width, self.width, out)
+            out[size_at] = len(out) - size_at - 1
+        try:
+            self.sock.sendto(out, self.addr)
+            self.sent += 1
+        except OSError:
+            pass  # Viewer gone or buffer full; the next keyframe catches up
+
+    def frame(self, buf, prev=None):
+        """Mirror a new frame; only pages differing from prev unless a keyframe is due"""
+        now = time.time()
+        if prev is None or (now - self.last_keyframe) >= MIRROR_KEYFRAME_SECONDS:
+            self.last_keyframe = now
+            self._send(buf, range(self.pages), True)
+            return
+        w = self.width
+        changed = [p for p in range(self.pages) if page_differs(buf, prev, p * w, w)]
+        if changed:
+            self._send(buf, changed, False)
+
+    def page(self, buf, page):
+        """Mirror a single page written outside a full frame"""
+        self._send(buf, (page,), False)
+
+    def tick(self, buf):
+        """Send a keyframe of buf if one is due, even when nothing is drawn"""
+        if (time.time() - self.last_keyframe) >= MIRROR_KEYFRAME_SECONDS:
+            self.frame(buf)
+
+def start_mirror():
+    """Attach a FrameMirror to the display if MIRROR_HOST is set"""
+    if not MIRROR_HOST:
+        return
+    try:
+        oled.mirror = FrameMirror(MIRROR_HOST, MIRROR_PORT, oled.width, oled.pages)
+        oled.mirror.frame(frames.front_buf)
+        print("Mirroring display to", MIRROR_HOST)
+    except Exception as e:
+        print("Mirror not available:", e)
 
 # ============================================================
 # BRIGHTNESS CONTROL
 # ============================================================
 def set_bright():
-    global is_dimmed
+    global is_dimmed, display_on
+    if not display_on:
+        oled.poweron()
+        display_on = True
     oled.contrast(BRIGHT)
     is_dimmed = False
+    set_power_save(False)
 
 def set_dim():
     global is_dimmed
     oled.contrast(DIM)
     is_dimmed = True
+    if LOW_POWER_IDLE:
+        set_power_save(True)
+
+def set_display_off():
+    """Power the panel down after a long idle; set_bright() wakes it"""
+    global display_on
+    oled.poweroff()
+    display_on = False
+
+# ============================================================
+# POWER MANAGEMENT
+# ============================================================
+def set_power_save(on):
+    """
+    Switch the WiFi chip between power-save and full performance. In
+    dual-core mode core 1 owns the WLAN, so the request goes through the
+    mailbox and the worker applies it.
+    """
+    if mailbox is not None:
+        mailbox.power_save_req = on
+        return
+    apply_power_save(on)
+
+def apply_power_save(on):
+    """Set the WiFi power mode; only from the core that owns the WLAN"""
+    global radio_power_save
+    if on == radio_power_save:
+        return
+    mode = getattr(network.WLAN, "PM_POWERSAVE" if on else "PM_PERFORMANCE", None)
+    if mode is not None:
+        try:
+            wifi.wlan.config(pm=mode)
+        except Exception as e:
+            print("WiFi power mode error:", e)
+    radio_power_save = on
+
+def on_button_irq(pin):
+    global button_latched
+    button_latched = True
+
+def arm_button_wake():
+    """Latch presses by IRQ; on rp2 the same IRQ wakes lightsleep"""
+    try:
+        button.irq(handler=on_button_irq, trigger=Pin.IRQ_FALLING)
+    except Exception as e:
+        print("Button IRQ not available:", e)
+
+def idle_sleep(seconds):
+    """
+    Sleep until the next poll. While dimmed (single-core only) this uses
+    lightsleep, which a button press cuts short.
+    """
+    if seconds <= 0:
+        return
+    if (LOW_POWER_IDLE and lightsleep and is_dimmed and mailbox is None
+            and not button_latched and not frames.busy()):
+        lightsleep(int(seconds * 1000))
+    else:
+        time.sleep(seconds)
 
 # ============================================================
 # BUTTON CHECK
 # ============================================================
 def check_button():
     """Check if button was pressed (with debounce)"""
-    global last_button_time
+    global last_button_time, button_latched
     
-    if button.value() == 0:
-        now = time.time()
-        if now - last_button_time > 0.5:
+    if button_latched or button.value() == 0:
+        button_latched = False
+        now = time.ticks_ms()
+        if (last_button_time is None or
+                time.ticks_diff(now, last_button_time) > BUTTON_DEBOUNCE_MS):
             last_button_time = now
             return True
     return False
@@ -263,28 +656,196 @@ def check_button():
 # ============================================================
 # WIFI
 # ============================================================
+WIFI_FAIL_STATES = tuple(
+    getattr(network, name) for name in
+    ("STAT_WRONG_PASSWORD", "STAT_NO_AP_FOUND", "STAT_CONNECT_FAIL")
+    if hasattr(network, name)
+)
+
+def load_wifi_cache():
+    """Load the last good access point and lease. Returns {} if missing."""
+    try:
+        with open(WIFI_CACHE_FILE) as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+def save_wifi_cache(cache):
+    try:
+        with open(WIFI_CACHE_FILE, "w") as f:
+            json.dump(cache, f)
+    except Exception as e:
+        print("WiFi cache error:", e)
+
+class WifiManager:
+    """
+    Owns the single STA interface. Reconnects to the cached access point
+    first, falls back to a plain connect, and watches the link state
+    without blocking so the main loop never sits in a connect wait.
+    """
+    def __init__(self, ssid, password):
+        self.ssid = ssid
+        self.password = password
+        self.wlan = network.WLAN(network.STA_IF)
+        self.cache = load_wifi_cache()
+        self.down_since = None     # ticks_ms when the link was lost
+        self.attempt_start = 0
+        self.attempt_fast = False
+        self.scan_pending = False  # AP not learned yet; scan at the next blocking connect
+        # Metrics
+        self.reconnects = 0
+        self.fast_reconnects = 0
+        self.last_reconnect_ms = 0
+        self.max_reconnect_ms = 0
+
+    def _begin(self, fast):
+        """Start a (non-blocking) association attempt."""
+        wlan = self.wlan
+        wlan.active(True)
+        static = WIFI_STATIC_IP
+        if static is None and fast and WIFI_REUSE_LEASE:
+            static = self.cache.get("ifconfig")
+        if static:
+            wlan.ifconfig(tuple(static))  # Skips DHCP
+        elif WIFI_REUSE_LEASE:
+            try:
+                wlan.ifconfig("dhcp")  # Undo a reused lease that failed
+            except Exception:
+                pass
+        bssid = self.cache.get("bssid") if fast else None
+        if bssid:
+            wlan.connect(self.ssid, self.password, bssid=bytes.fromhex(bssid))
+        else:
+            wlan.connect(self.ssid, self.password)
+        self.attempt_start = time.ticks_ms()
+        self.attempt_fast = bool(bssid)
+
+    def _attempt_expired(self, now):
+        if self.wlan.status() in WIFI_FAIL_STATES:
+            return True
+        limit = WIFI_FAST_TIMEOUT_MS if self.attempt_fast else WIFI_CONNECT_TIMEOUT_MS
+        return time.ticks_diff(now, self.attempt_start) > limit
+
+    def _config(self, param):
+        """wlan.config(param), or None where the port can't report it"""
+        try:
+            return self.wlan.config(param)
+        except Exception:
+            return None
+
+    def _scan(self, cache):
+        """Pick the strongest AP for our SSID. Blocks for seconds on cyw43."""
+        self.scan_pending = False
+        try:
+            for ap in self.wlan.scan():
+                ssid, bssid, channel, rssi = ap[:4]
+                if ssid.decode() == self.ssid and rssi > cache.get("rssi", -999):
+                    cache["bssid"] = bssid.hex()
+                    cache["channel"] = channel
+                    cache["rssi"] = rssi
+        except Exception as e:
+            print("WiFi scan error:", e)
+
+    def _save(self, cache):
+        if cache != self.cache:
+            self.cache = cache
+            save_wifi_cache(cache)
+
+    def _learn(self, may_block):
+        """
+        Remember the access point and lease after a successful connect.
+        The AP comes from the connected BSSID where the port reports it.
+        Otherwise a scan is needed, which only runs when may_block is set
+        (a blocking connect); the non-blocking watcher defers it.
+        """
+        cache = dict(self.cache)
+        cache["ifconfig"] = list(self.wlan.ifconfig())
+        if not self.attempt_fast:
+            bssid = self._config("bssid")
+            if isinstance(bssid, (bytes, bytearray)) and len(bssid) == 6:
+                cache["bssid"] = bytes(bssid).hex()
+                channel = self._config("channel")
+                if channel:
+                    cache["channel"] = channel
+                cache["rssi"] = self.wlan.status("rssi")
+                self.scan_pending = False
+            elif may_block:
+                self._scan(cache)
+            else:
+                self.scan_pending = True
+        self._save(cache)
+
+    def _connected(self, started, may_block):
+        elapsed = time.ticks_diff(time.ticks_ms(), started)
+        self.reconnects += 1
+        if self.attempt_fast:
+            self.fast_reconnects += 1
+        self.last_reconnect_ms = elapsed
+        if elapsed > self.max_reconnect_ms:
+            self.max_reconnect_ms = elapsed
+        print("WiFi up in", elapsed, "ms", "(fast)" if self.attempt_fast else "")
+        self._learn(may_block)
+
+    def _forget_ap(self):
+        print("Cached AP failed, doing full connect")
+        self.cache.pop("bssid", None)
+        self.cache.pop("rssi", None)
+
+    def connect(self):
+        """Blocking connect for init screens. Returns True if connected."""
+        if self.wlan.isconnected():
+            if self.scan_pending:
+                # Learn the AP the watcher reconnected to without blocking
+                cache = dict(self.cache)
+                self._scan(cache)
+                self._save(cache)
+            return True
+        started = time.ticks_ms()
+        self._begin(fast=True)
+        while True:
+            if self.wlan.isconnected():
+                self._connected(started, True)
+                return True
+            if self._attempt_expired(time.ticks_ms()):
+                if not self.attempt_fast:
+                    return False
+                self._forget_ap()
+                self._begin(fast=False)
+            time.sleep(WIFI_POLL_INTERVAL)
+
+    def poll(self):
+        """Non-blocking link watcher. Returns True while the link is up."""
+        if self.wlan.isconnected():
+            if self.down_since is not None:
+                self._connected(self.down_since, False)
+                self.down_since = None
+            return True
+        now = time.ticks_ms()
+        if self.down_since is None:
+            print("WiFi link lost")
+            self.down_since = now
+            self._begin(fast=True)
+        elif self._attempt_expired(now):
+            if self.attempt_fast:
+                self._forget_ap()
+            self._begin(fast=False)
+        return False
+
+wifi = WifiManager(WIFI_SSID, WIFI_PASS)
+
 def check_wifi():
     """Check if WiFi is connected, connect if not. Returns True if connected."""
-    wlan = network.WLAN(network.STA_IF)
-    
-    # Already connected
-    if wlan.isconnected():
-        return True
-    
-    # Need to connect
-    wlan.active(True)
-    wlan.connect(WIFI_SSID, WIFI_PASS)
-    
-    timeout = 20
-    while not wlan.isconnected() and timeout > 0:
-        time.sleep(0.5)
-        timeout -= 1
-    
-    return wlan.isconnected()
+    return wifi.connect()
 
 # ============================================================
 # NTP TIME SYNC
 # ============================================================
+def set_rtc(unix_timestamp):
+    """Set the RTC from a UTC unix timestamp"""
+    import machine
+    tm = time.gmtime(unix_timestamp)
+    machine.RTC().datetime((tm[0], tm[1], tm[2], tm[6] + 1, tm[3], tm[4], tm[5], 0))
+
 def sync_ntp():
     """Sync time from NTP server. Returns True if successful."""
     sock = None
@@ -305,11 +866,7 @@ def sync_ntp():
         ntp_response = sock.recv(48)
         
         timestamp = int.from_bytes(ntp_response[40:44], 'big')
-        unix_timestamp = timestamp - 2208988800
-        
-        import machine
-        tm = time.gmtime(unix_timestamp)
-        machine.RTC().datetime((tm[0], tm[1], tm[2], tm[6] + 1, tm[3], tm[4], tm[5], 0))
+        set_rtc(timestamp - 2208988800)
         
         return True
     except Exception as e:
@@ -325,28 +882,30 @@ def sync_ntp():
 # ============================================================
 # SONOS API
 # ============================================================
-def get_volume(ip):
-    """Get current volume from Sonos. Returns None on error."""
+def soap_request(ip, path, service, action, template):
+    """Build the HTTP POST for a SOAP action"""
+    body = template.format(service)
+    return (
+        "POST {} HTTP/1.1\r\n"
+        "Host: {}:1400\r\n"
+        "Content-Type: text/xml; charset=\"utf-8\"\r\n"
+        "SOAPACTION: \"{}#{}\"\r\n"
+        "Content-Length: {}\r\n\r\n{}"
+    ).format(path, ip, service, action, len(body), body).encode()
+
+def soap_call(ip, request, max_chunks=20):
+    """Send a SOAP request and return the raw response bytes"""
     sock = None
     try:
-        body = SOAP_VOLUME.format(SERVICE_TYPE)
-        request = (
-            "POST /MediaRenderer/RenderingControl/Control HTTP/1.1\r\n"
-            "Host: {}:1400\r\n"
-            "Content-Type: text/xml; charset=\"utf-8\"\r\n"
-            "SOAPACTION: \"{}#GetVolume\"\r\n"
-            "Content-Length: {}\r\n\r\n{}"
-        ).format(ip, SERVICE_TYPE, len(body), body)
-        
         sock = socket.socket()
         sock.settimeout(2)
         sock.connect((ip, 1400))
-        sock.send(request.encode())
+        sock.send(request)
         
         data = b""
         sock.settimeout(1)
         # Limit read attempts to prevent infinite loop
-        for _ in range(20):
+        for _ in range(max_chunks):
             try:
                 chunk = sock.recv(512)
                 if not chunk:
@@ -356,17 +915,7 @@ def get_volume(ip):
                     break
             except:
                 break
-        
-        text = data.decode("utf-8", "ignore")
-        start = text.find("<CurrentVolume>")
-        if start == -1:
-            return None
-        end = text.find("</CurrentVolume>", start)
-        vol = int(text[start + 15:end])
-        return vol // 2
-    except Exception as e:
-        print("Volume error:", e)
-        return None
+        return data
     finally:
         if sock:
             try:
@@ -374,120 +923,1261 @@ def get_volume(ip):
             except:
                 pass
 
-def get_mute(ip):
-    """Get mute state from Sonos. Returns False on error."""
-    sock = None
+def parse_volume(data):
+    """Extract the volume from a GetVolume response. Returns None if absent."""
+    text = data.decode("utf-8", "ignore")
+    start = text.find("<CurrentVolume>")
+    if start == -1:
+        return None
+    end = text.find("</CurrentVolume>", start)
+    vol = int(text[start + 15:end])
+    return vol // 2
+
+def parse_mute(data):
+    """Extract the mute flag from a GetMute response. Returns False if absent."""
+    text = data.decode("utf-8", "ignore")
+    start = text.find("<CurrentMute>")
+    if start == -1:
+        return False
+    end = text.find("</CurrentMute>", start)
+    return text[start + 13:end] == "1"
+
+def parse_hms(text):
+    """'H:MM:SS' to milliseconds. Returns 0 for NOT_IMPLEMENTED and the like."""
+    ms = 0
+    for part in text.split(":"):
+        if not part.isdigit():
+            return 0
+        ms = ms * 60 + int(part)
+    return ms * 1000
+
+def parse_position(data):
+    """Extract (rel_ms, duration_ms) from a GetPositionInfo response, or None."""
+    text = data.decode("utf-8", "ignore")
+    start = text.find("<TrackDuration>")
+    if start == -1:
+        return None
+    duration = parse_hms(text[start + 15:text.find("</TrackDuration>", start)])
+    start = text.find("<RelTime>")
+    if start == -1:
+        return None
+    rel = parse_hms(text[start + 9:text.find("</RelTime>", start)])
+    return rel, duration
+
+def parse_playing(data):
+    """True if a GetTransportInfo response says the track is playing"""
+    text = data.decode("utf-8", "ignore")
+    return xml_text(text, "CurrentTransportState") == "PLAYING"
+
+def xml_text(text, tag):
+    """Text of the first <tag>, or None"""
+    start = text.find("<" + tag + ">")
+    if start == -1:
+        return None
+    start += len(tag) + 2
+    return text[start:text.find("</" + tag + ">", start)]
+
+def xml_attr(text, start, name):
+    """
+    Value of the first name= attribute at or after start, or None.
+    ZoneGroupState arrives XML-escaped, so quotes may be &quot;.
+    """
+    i = text.find(name + "=", start)
+    if i == -1:
+        return None
+    i += len(name) + 1
+    quote = "&quot;" if text.startswith("&quot;", i) else '"'
+    i += len(quote)
+    return text[i:text.find(quote, i)]
+
+def parse_zone_attributes(data):
+    """(group_id, member_count) from a GetZoneGroupAttributes response, or None"""
+    text = data.decode("utf-8", "ignore")
+    group_id = xml_text(text, "CurrentZoneGroupID")
+    if group_id is None:
+        return None
+    members = xml_text(text, "CurrentZonePlayerUUIDsInGroup") or ""
+    return group_id, members.count(",") + 1 if members else 1
+
+def parse_coordinator(data, ip):
+    """IP of the coordinator of ip's group from a GetZoneGroupState response, or None"""
+    text = data.decode("utf-8", "ignore")
+    me = text.find("//" + ip + ":")
+    if me == -1:
+        return None
+    # "ZoneGroup " with the space skips ZoneGroupMember and ZoneGroups
+    group = text.rfind("ZoneGroup ", 0, me)
+    uuid = xml_attr(text, group, "Coordinator") if group != -1 else None
+    if not uuid:
+        return None
+    at = text.find("UUID=", group)
+    while at != -1:
+        if xml_attr(text, at, "UUID") == uuid:
+            location = xml_attr(text, at, "Location") or ""
+            start = location.find("//")
+            if start == -1:
+                return None
+            return location[start + 2:location.find(":", start + 2)]
+        at = text.find("UUID=", at + 5)
+    return None
+
+def get_volume(ip, group=False):
+    """Get current volume (or group volume from a coordinator). Returns None on error."""
     try:
-        body = SOAP_MUTE.format(SERVICE_TYPE)
-        request = (
-            "POST /MediaRenderer/RenderingControl/Control HTTP/1.1\r\n"
-            "Host: {}:1400\r\n"
-            "Content-Type: text/xml; charset=\"utf-8\"\r\n"
-            "SOAPACTION: \"{}#GetMute\"\r\n"
-            "Content-Length: {}\r\n\r\n{}"
-        ).format(ip, SERVICE_TYPE, len(body), body)
-        
-        sock = socket.socket()
-        sock.settimeout(2)
-        sock.connect((ip, 1400))
-        sock.send(request.encode())
-        
-        data = b""
-        sock.settimeout(1)
-        # Limit read attempts to prevent infinite loop
-        for _ in range(20):
+        if group:
+            request = soap_request(ip, GRC_PATH, GRC_SERVICE, "GetGroupVolume", SOAP_GROUP_VOLUME)
+        else:
+            request = soap_request(ip, RC_PATH, SERVICE_TYPE, "GetVolume", SOAP_VOLUME)
+        return parse_volume(soap_call(ip, request))
+    except Exception as e:
+        print("Volume error:", e)
+        return None
+
+def get_mute(ip, group=False):
+    """Get mute state (or group mute from a coordinator). Returns False on error."""
+    try:
+        if group:
+            request = soap_request(ip, GRC_PATH, GRC_SERVICE, "GetGroupMute", SOAP_GROUP_MUTE)
+        else:
+            request = soap_request(ip, RC_PATH, SERVICE_TYPE, "GetMute", SOAP_MUTE)
+        return parse_mute(soap_call(ip, request))
+    except Exception as e:
+        print("Mute error:", e)
+        return False
+
+def get_zone_attributes(ip):
+    """(group_id, member_count) for the player at ip. Returns None on error."""
+    try:
+        request = soap_request(ip, ZGT_PATH, ZGT_SERVICE, "GetZoneGroupAttributes", SOAP_ZONE_ATTRIBUTES)
+        return parse_zone_attributes(soap_call(ip, request))
+    except Exception as e:
+        print("Zone attributes error:", e)
+        return None
+
+def get_coordinator(ip):
+    """IP of the coordinator of ip's group. Returns None on error."""
+    try:
+        request = soap_request(ip, ZGT_PATH, ZGT_SERVICE, "GetZoneGroupState", SOAP_ZONE_STATE)
+        # The whole household's topology, so allow a larger response
+        return parse_coordinator(soap_call(ip, request, max_chunks=80), ip)
+    except Exception as e:
+        print("Zone state error:", e)
+        return None
+
+def get_position(ip):
+    """
+    Get (rel_ms, duration_ms, playing) of the current track. Returns None
+    on error.
+    """
+    try:
+        request = soap_request(ip, AVT_PATH, AVT_SERVICE, "GetPositionInfo", SOAP_POSITION)
+        position = parse_position(soap_call(ip, request))
+        if position is None:
+            return None
+        request = soap_request(ip, AVT_PATH, AVT_SERVICE, "GetTransportInfo", SOAP_TRANSPORT_INFO)
+        return position[0], position[1], parse_playing(soap_call(ip, request))
+    except Exception as e:
+        print("Position error:", e)
+        return None
+
+# ============================================================
+# ZONE GROUPS
+# ============================================================
+def http_header(head, name):
+    """Value of header name in an HTTP head (str), or None"""
+    start = head.lower().find("\r\n" + name.lower() + ":")
+    if start == -1:
+        return None
+    start += len(name) + 3
+    end = head.find("\r\n", start)
+    return head[start:end if end != -1 else len(head)].strip()
+
+class TopologyEvents:
+    """
+    UPnP event subscription to SONOS_IP's ZoneGroupTopology service. The
+    speaker sends a NOTIFY to a listener on EVENT_PORT when the household's
+    topology changes (and once right after subscribing). The subscription
+    is renewed at half the granted timeout; when it cannot be set up,
+    it is retried every TOPOLOGY_CHECK_INTERVAL.
+    """
+    def __init__(self):
+        self.server = None
+        self.sid = None
+        self.expires = 0     # ticks_ms when the subscription lapses
+        self.renew_at = 0
+        self.retry_at = None
+        self.notifies = 0
+
+    def live(self):
+        return self.sid is not None and time.ticks_diff(self.expires, time.ticks_ms()) > 0
+
+    def maintain(self):
+        """Open the listener and subscribe or renew, when due"""
+        now = time.ticks_ms()
+        if self.retry_at is not None and time.ticks_diff(now, self.retry_at) < 0:
+            return
+        if self.live() and time.ticks_diff(now, self.renew_at) < 0:
+            return
+        self.retry_at = time.ticks_add(now, TOPOLOGY_CHECK_INTERVAL * 1000)
+        try:
+            if self.server is None:
+                server = socket.socket()
+                server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                server.bind(("0.0.0.0", EVENT_PORT))
+                server.listen(2)
+                server.setblocking(False)
+                self.server = server
+            if self.live():
+                headers = "SID: {}\r\n".format(self.sid)
+            else:
+                headers = "CALLBACK: <http://{}:{}/zgt>\r\nNT: upnp:event\r\n".format(
+                    wifi.wlan.ifconfig()[0], EVENT_PORT)
+            request = (
+                "SUBSCRIBE /ZoneGroupTopology/Event HTTP/1.1\r\n"
+                "Host: {}:1400\r\n{}TIMEOUT: Second-{}\r\n"
+                "Connection: close\r\nContent-Length: 0\r\n\r\n"
+            ).format(SONOS_IP, headers, TOPOLOGY_EVENT_TIMEOUT).encode()
+            head = soap_call(SONOS_IP, request, max_chunks=2).decode("utf-8", "ignore")
+        except Exception as e:
+            print("Topology subscribe error:", e)
+            self.sid = None
+            return
+        sid = http_header(head, "SID")
+        granted = http_header(head, "TIMEOUT") or ""
+        if not head.startswith("HTTP/1.1 200") or not sid:
+            print("Topology subscribe refused")
+            self.sid = None
+            return
+        seconds = TOPOLOGY_EVENT_TIMEOUT
+        if granted.startswith("Second-") and granted[7:].isdigit():
+            seconds = int(granted[7:])
+        self.sid = sid
+        self.expires = time.ticks_add(now, seconds * 1000)
+        self.renew_at = time.ticks_add(now, seconds * 500)
+        self.retry_at = None
+
+    def poll(self):
+        """Answer waiting NOTIFYs. Returns True if one was for our subscription."""
+        changed = False
+        while self.server is not None:
             try:
-                chunk = sock.recv(512)
-                if not chunk:
-                    break
-                data += chunk
-                if b"</s:Envelope>" in data:
-                    break
-            except:
+                conn, addr = self.server.accept()
+            except OSError:
                 break
-        
-        text = data.decode("utf-8", "ignore")
-        start = text.find("<CurrentMute>")
-        if start == -1:
+            try:
+                conn.settimeout(1)
+                head = b""
+                while b"\r\n\r\n" not in head and len(head) < 2048:
+                    chunk = conn.recv(256)
+                    if not chunk:
+                        break
+                    head += chunk
+                end = head.find(b"\r\n\r\n")
+                text = head[:end].decode("utf-8", "ignore")
+                # The body (the whole ZoneGroupState) is not needed; drain it
+                left = int(http_header(text, "Content-Length") or 0) - (len(head) - end - 4)
+                while left > 0:
+                    chunk = conn.recv(min(left, 512))
+                    if not chunk:
+                        break
+                    left -= len(chunk)
+                conn.send(b"HTTP/1.1 200 OK\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+                if text.startswith("NOTIFY") and http_header(text, "SID") == self.sid:
+                    self.notifies += 1
+                    changed = True
+            except Exception as e:
+                print("Topology event error:", e)
+            finally:
+                conn.close()
+        return changed
+
+class ZoneTopology:
+    """
+    Where volume queries for SONOS_IP go. Sonos keeps the group volume on
+    the group's coordinator (SONOS_IP itself when it plays alone), so the
+    coordinator's address is looked up from ZoneGroupTopology and cached
+    and every refresh is one group query to it. SONOS_IP's group ID is
+    re-read when a topology event arrives (every TOPOLOGY_CHECK_INTERVAL
+    without a live subscription) or after the coordinator failed to
+    answer; the full topology is only fetched again when that ID changed.
+    """
+    def __init__(self):
+        self.group_id = None
+        self.coordinator = SONOS_IP
+        self.checked_at = None
+        self.fetches = 0
+        self.events = None
+
+    def recheck(self):
+        """Re-read the group ID at the next check, keeping the cached target"""
+        self.checked_at = None
+
+    def due(self):
+        """True if the group ID should be re-read now"""
+        if TOPOLOGY_EVENTS:
+            if self.events is None:
+                self.events = TopologyEvents()
+            self.events.maintain()
+            if self.events.poll():
+                return True
+        if self.checked_at is None:
+            return True
+        if self.events is not None and self.events.live():
             return False
-        end = text.find("</CurrentMute>", start)
-        return text[start + 13:end] == "1"
+        return time.ticks_diff(time.ticks_ms(), self.checked_at) >= TOPOLOGY_CHECK_INTERVAL * 1000
+
+    def check(self):
+        """Refresh the cached coordinator if a check is due and the group changed"""
+        if not self.due():
+            return
+        self.checked_at = time.ticks_ms()
+        attrs = get_zone_attributes(SONOS_IP)
+        if attrs is None or attrs[0] == self.group_id:
+            return
+        group_id, members = attrs
+        coordinator = SONOS_IP
+        if members > 1:
+            coordinator = get_coordinator(SONOS_IP)
+            if coordinator is None:
+                return  # Keep the old target and retry at the next check
+        self.group_id = group_id
+        self.coordinator = coordinator
+        self.fetches += 1
+        print("Zone group:", members, "player(s), coordinator", coordinator)
+
+topology = ZoneTopology()
+
+def read_speaker(check=True):
+    """
+    Read (vol, mute) for SONOS_IP's group: group volume from the
+    coordinator once the group is known, the player's own volume until
+    then. vol is None on error. check=False skips the topology check
+    unless a failed read asked for one.
+    """
+    if FOLLOW_GROUP and (check or topology.checked_at is None):
+        topology.check()
+    ip = topology.coordinator
+    group = topology.group_id is not None
+    vol = get_volume(ip, group)
+    if vol is None:
+        if group:
+            # The coordinator may have moved; until the check says so,
+            # keep asking it, so a probe after an outage reads the same
+            # group volume as before and nothing redraws for nothing
+            topology.recheck()
+        return None, False
+    return vol, get_mute(ip, group)
+
+# ============================================================
+# SAVED STATE
+# ============================================================
+STATE_FMT = "<2sBBB4sIB"  # magic, version, vol, mute, speaker ip, unix time, checksum
+STATE_MAGIC = b"SV"
+STATE_VERSION = 1
+
+def pack_state(vol, mute, unix_time):
+    ip = bytes(int(x) for x in SONOS_IP.split("."))
+    rec = bytearray(struct.pack(STATE_FMT, STATE_MAGIC, STATE_VERSION, vol,
+                                1 if mute else 0, ip, int(unix_time), 0))
+    rec[-1] = sum(rec) & 0xFF
+    return bytes(rec)
+
+def unpack_state(rec):
+    """Returns (vol, mute, unix_time), or None if the record is invalid or for another speaker."""
+    if not rec or len(rec) != struct.calcsize(STATE_FMT):
+        return None
+    if (sum(rec[:-1]) & 0xFF) != rec[-1]:
+        return None
+    magic, version, vol, mute, ip, unix_time, _ = struct.unpack(STATE_FMT, rec)
+    if magic != STATE_MAGIC or version != STATE_VERSION:
+        return None
+    if ip != bytes(int(x) for x in SONOS_IP.split(".")):
+        return None
+    return vol, mute == 1, unix_time
+
+class StateStore:
+    """
+    Last known speaker state and an RTC snapshot in a small fixed record.
+    RTC scratch memory, where the port has it, is updated on every change.
+    Flash writes only happen when the state differs from what is on flash,
+    after changes settle for STATE_SAVE_DELAY, and at most once per
+    STATE_FLASH_MIN_INTERVAL.
+    """
+    def __init__(self):
+        self.rtc = None
+        try:
+            rtc = RTC()
+            rtc.memory()
+            self.rtc = rtc
+        except Exception:
+            pass
+        self.flash_state = None  # (vol, mute) last written to flash
+        self.pending = None      # (vol, mute) waiting for a flash write
+        self.changed_at = 0
+        self.flash_written_at = -STATE_FLASH_MIN_INTERVAL
+        self.flash_writes = 0
+
+    def load(self):
+        """Load the freshest valid record: RTC memory first, then flash."""
+        saved = None
+        if self.rtc:
+            saved = unpack_state(self.rtc.memory())
+        try:
+            with open(STATE_FILE, "rb") as f:
+                flash = unpack_state(f.read())
+            if flash:
+                self.flash_state = flash[:2]
+                if saved is None or flash[2] > saved[2]:
+                    saved = flash
+        except OSError:
+            pass
+        return saved
+
+    def update(self, vol, mute):
+        state = (vol, mute)
+        if state == self.pending or (self.pending is None and state == self.flash_state):
+            return
+        now = time.time()
+        if self.rtc:
+            self.rtc.memory(pack_state(vol, mute, now))
+        self.pending = None if state == self.flash_state else state
+        self.changed_at = now
+
+    def tick(self, now):
+        """Write a settled change to flash when allowed"""
+        if self.pending is None:
+            return
+        if (now - self.changed_at) < STATE_SAVE_DELAY:
+            return
+        if (now - self.flash_written_at) < STATE_FLASH_MIN_INTERVAL:
+            return
+        try:
+            with open(STATE_FILE, "wb") as f:
+                f.write(pack_state(self.pending[0], self.pending[1], now))
+            self.flash_state = self.pending
+            self.flash_writes += 1
+        except OSError as e:
+            print("State save error:", e)
+        self.pending = None
+        self.flash_written_at = now
+
+state_store = StateStore()
+
+def restore_state():
+    """
+    Paint the saved speaker state straight away, marked stale, and bring
+    the RTC forward to the saved snapshot if it lost time across the reset.
+    Returns (vol, mute) or None if nothing was saved.
+    """
+    global state_stale
+    saved = state_store.load()
+    if saved is None:
+        return None
+    vol, mute, unix_time = saved
+    if time.time() < unix_time:
+        set_rtc(unix_time)
+    state_stale = True
+    show_speaker_state(vol, mute)
+    # Nothing steps the frame out during the blocking init, so send it now
+    frames.flush()
+    print("Restored saved state:", vol, "muted" if mute else "")
+    return vol, mute
+
+# ============================================================
+# CIRCUIT BREAKER
+# ============================================================
+BREAKER_CLOSED = 0     # Speaker answering, poll normally
+BREAKER_OPEN = 1       # Speaker down, no requests until the backoff expires
+BREAKER_HALF_OPEN = 2  # Backoff expired, one probe request allowed
+
+class CircuitBreaker:
+    """
+    Stops hammering a speaker that is not answering. After
+    BREAKER_THRESHOLD failures in a row it opens and allows a single
+    probe after an exponentially growing, jittered backoff. A successful
+    probe closes it again.
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.state = BREAKER_CLOSED
+        self.failures = 0
+        self.backoff_ms = BREAKER_BASE_MS
+        self.retry_at = 0
+
+    def allow(self):
+        """True if a request may go out now"""
+        if self.state == BREAKER_OPEN:
+            if time.ticks_diff(time.ticks_ms(), self.retry_at) < 0:
+                return False
+            self.state = BREAKER_HALF_OPEN
+        return True
+
+    def success(self):
+        if self.state != BREAKER_CLOSED:
+            print("Speaker reachable again")
+        self.reset()
+
+    def failure(self):
+        self.failures += 1
+        if self.state == BREAKER_HALF_OPEN:
+            self.backoff_ms = min(self.backoff_ms * 2, BREAKER_MAX_MS)
+            self._open()
+        elif self.state == BREAKER_CLOSED and self.failures >= BREAKER_THRESHOLD:
+            self._open()
+
+    def _open(self):
+        # Equal jitter: half the backoff fixed, half random
+        half = self.backoff_ms // 2
+        delay = half + random.getrandbits(16) % (half + 1)
+        self.retry_at = time.ticks_add(time.ticks_ms(), delay)
+        self.state = BREAKER_OPEN
+        print("Speaker down, next probe in", delay, "ms")
+
+breaker = CircuitBreaker()
+
+def speaker_down():
+    """True while the breaker has given up on the speaker"""
+    if mailbox is None:
+        return breaker.state != BREAKER_CLOSED
+    return mailbox.snap[MB_BREAKER] != BREAKER_CLOSED
+
+# ============================================================
+# PUSH MODE (host/aggregator.py)
+# ============================================================
+# Keep in sync with host/aggregator.py
+PUSH_STATE_FMT = "!2sBBHIIB4s16s"  # magic, version, flags, session, seq, time, volume, player ip, room
+PUSH_STATE_SIZE = struct.calcsize(PUSH_STATE_FMT)
+PUSH_MAGIC = b"SM"
+PUSH_SUBSCRIBE_MAGIC = b"SS"
+PUSH_VERSION = 2
+PUSH_FLAG_MUTE = 0x01
+PUSH_FLAG_OK = 0x02      # Aggregator reached the speaker
+
+def parse_state_packet(data):
+    """Decode a state packet. Returns (session, seq, unix_time, vol, mute, ok, player, room) or None."""
+    if len(data) != PUSH_STATE_SIZE:
+        return None
+    magic, version, flags, session, seq, unix_time, vol, player, room = struct.unpack(PUSH_STATE_FMT, data)
+    if magic != PUSH_MAGIC or version != PUSH_VERSION:
+        return None
+    room = room.rstrip(b"\x00")
+    return (session, seq, unix_time, vol, bool(flags & PUSH_FLAG_MUTE), bool(flags & PUSH_FLAG_OK),
+            player, room)
+
+class PushReceiver:
+    """
+    Receives state packets from the aggregator on a non-blocking UDP
+    socket. Subscribes by unicast (renewed periodically) and/or joins
+    the multicast group. A multicast group carries every player's packets,
+    each with its own sequence, so packets for players other than SONOS_IP
+    are ignored. Only sequence numbers newer than the last accepted one
+    are used, so reordered or duplicated packets are dropped.
+    """
+    def __init__(self):
+        self.player = bytes(int(x) for x in SONOS_IP.split("."))
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("0.0.0.0", PUSH_PORT))
+        self.sock.setblocking(False)
+        if PUSH_GROUP:
+            self.join_group()
+        self.session = None
+        self.seq = 0
+        self.last_packet = time.time()
+        self.last_subscribe = 0
+        self.received = 0
+        self.dropped = 0
+
+    def join_group(self):
+        try:
+            group = bytes(int(x) for x in PUSH_GROUP.split("."))
+            self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, group + bytes(4))
+        except Exception as e:
+            print("Multicast join failed:", e)
+
+    def subscribe(self, now):
+        if not AGGREGATOR_IP or (now - self.last_subscribe) < PUSH_SUBSCRIBE_INTERVAL:
+            return
+        self.last_subscribe = now
+        try:
+            msg = PUSH_SUBSCRIBE_MAGIC + bytes((PUSH_VERSION,)) + SONOS_IP.encode()
+            self.sock.sendto(msg, (AGGREGATOR_IP, AGGREGATOR_PORT))
+        except Exception as e:
+            print("Subscribe error:", e)
+
+    def stale(self, now):
+        return (now - self.last_packet) > PUSH_STALE_SECONDS
+
+    def poll(self):
+        """Drain pending packets. Returns (vol, mute) from the newest, or None if nothing new."""
+        now = time.time()
+        self.subscribe(now)
+        if self.stale(now):
+            self.session = None  # Accept any sequence after a gap
+        latest = None
+        while True:
+            try:
+                data = self.sock.recv(64)
+            except OSError:
+                break
+            pkt = parse_state_packet(data)
+            if pkt is None:
+                self.dropped += 1
+                continue
+            session, seq, unix_time, vol, mute, ok, player, room = pkt
+            if player != self.player or (SONOS_ROOM and room != SONOS_ROOM.encode()):
+                continue
+            delta = (seq - self.seq) & 0xFFFFFFFF
+            if session == self.session and not 0 < delta < 0x80000000:
+                self.dropped += 1
+                continue
+            self.session = session
+            self.seq = seq
+            self.last_packet = now
+            self.received += 1
+            latest = (vol if ok else None, mute if ok else False)
+            if abs(time.time() - unix_time) > PUSH_TIME_SLEW:
+                set_rtc(unix_time)
+        return latest
+
+def start_push():
+    """Open the push receiver if configured. Returns it or None."""
+    if not (AGGREGATOR_IP or PUSH_GROUP):
+        return None
+    try:
+        receiver = PushReceiver()
     except Exception as e:
-        print("Mute error:", e)
+        print("Push mode not available:", e)
+        return None
+    print("Push mode")
+    return receiver
+
+link_up = True  # Last wifi.poll() result, on the core that owns the network
+
+def fetch_speaker():
+    """
+    One network round for the speaker state. Uses push packets while they
+    are arriving, otherwise polls the speaker directly. Returns (vol, mute),
+    or None if there is nothing new (push mode, or the breaker is open).
+    """
+    if push is not None:
+        result = push.poll()
+        if result is not None or not push.stale(time.time()):
+            if result is not None:
+                if result[0] is None:
+                    breaker.failure()
+                else:
+                    breaker.success()
+            return result
+    if not breaker.allow():
+        return None
+    # Probes of a speaker that was down only run a pending re-check
+    vol, mute = read_speaker(check=breaker.state == BREAKER_CLOSED)
+    if vol is None:
+        breaker.failure()
+        return None, False
+    breaker.success()
+    return vol, mute
+
+def poll_link():
+    """
+    wifi.poll(), with each round spent waiting for the link counted as a
+    breaker failure so a long outage still ends on the error screen.
+    The breaker is reset when the link returns, so the speaker is
+    probed straight away rather than after the backoff.
+    """
+    global link_up
+    ok = wifi.poll()
+    if ok and not link_up:
+        breaker.reset()
+    elif not ok and breaker.allow():
+        breaker.failure()
+    link_up = ok
+    return ok
+
+def wifi_down():
+    """True while the WiFi link is down, as last seen by the network core"""
+    if mailbox is None:
+        return not link_up
+    return mailbox.snap[MB_WIFI] == 0
+
+def poll_period():
+    """Seconds between network rounds"""
+    if push is not None and not push.stale(time.time()):
+        return PUSH_TICK
+    return POLL_INTERVAL
+
+# ============================================================
+# TRACK PROGRESS
+# ============================================================
+class TrackProgress:
+    """
+    Playback position, synced from the speaker every
+    PROGRESS_SYNC_INTERVAL and interpolated with ticks_ms in between.
+    Only advances while the speaker reports the transport as PLAYING.
+    """
+    def __init__(self):
+        self.rel_ms = 0
+        self.duration_ms = 0
+        self.synced_at = time.ticks_ms()
+        self.playing = False
+
+    def update(self, rel_ms, duration_ms, playing):
+        self.playing = playing
+        self.rel_ms = rel_ms
+        self.duration_ms = duration_ms
+        self.synced_at = time.ticks_ms()
+
+    def position_ms(self):
+        if not self.playing:
+            return self.rel_ms
+        pos = self.rel_ms + time.ticks_diff(time.ticks_ms(), self.synced_at)
+        return min(pos, self.duration_ms)
+
+    def columns(self, width):
+        if not self.duration_ms:
+            return 0
+        return self.position_ms() * width // self.duration_ms
+
+progress = TrackProgress()
+last_position_sync = None  # ticks_ms of the last GetPositionInfo
+
+def sync_position():
+    """
+    Read the track position if a sync is due. Returns (rel_ms,
+    duration_ms, playing) or None. Skipped in push mode (the aggregator
+    owns speaker traffic) and while the breaker is open.
+    """
+    global last_position_sync
+    if not SHOW_PROGRESS or push is not None or breaker.state != BREAKER_CLOSED:
+        return None
+    now = time.ticks_ms()
+    if (last_position_sync is not None and
+            time.ticks_diff(now, last_position_sync) < PROGRESS_SYNC_INTERVAL * 1000):
+        return None
+    last_position_sync = now
+    # Only the coordinator reports the group's track position
+    return get_position(topology.coordinator)
+
+# ============================================================
+# STATE MAILBOX (core 1 -> core 0)
+# ============================================================
+# Slot layout of the shared state record
+MB_SEQ = 0      # Even when stable, odd while the worker is writing
+MB_VOL = 1      # Volume, or -1 if the speaker did not respond
+MB_MUTE = 2
+MB_WIFI = 3     # 1 while the link is up
+MB_BREAKER = 4  # CircuitBreaker state
+MB_TRACK_SEQ = 5  # Bumped on each position sync
+MB_TRACK_REL = 6
+MB_TRACK_DUR = 7
+MB_TRACK_PLAYING = 8
+MB_SIZE = 9
+MB_READ_RETRIES = 8
+
+class StateMailbox:
+    """
+    Lock-free single-writer/single-reader state record (a seqlock).
+    The worker bumps MB_SEQ to odd, writes the fields, then bumps it back
+    to even. The reader copies the fields and accepts them only if it saw
+    the same even sequence before and after the copy.
+    """
+    def __init__(self):
+        self.slots = array("i", [0] * MB_SIZE)
+        self.snap = array("i", [0] * MB_SIZE)  # Reader-owned copy
+        self.last_seq = 0
+        self.reinit_req = 0   # Written by core 0 only, read by core 1
+        self.track_seq = 0    # Last position sync core 0 has applied
+        self.beats = 0        # Bumped by core 1 every round, published or not
+        self.power_save_req = radio_power_save  # Written by core 0, applied by core 1
+        self.last_beats = 0
+        self.last_beat = time.time()
+
+    def publish(self, vol, mute, wifi_ok):
+        s = self.slots
+        s[MB_SEQ] += 1
+        s[MB_VOL] = -1 if vol is None else vol
+        s[MB_MUTE] = 1 if mute else 0
+        s[MB_WIFI] = 1 if wifi_ok else 0
+        s[MB_BREAKER] = breaker.state
+        s[MB_SEQ] += 1
+
+    def publish_position(self, rel_ms, duration_ms, playing):
+        s = self.slots
+        s[MB_SEQ] += 1
+        s[MB_TRACK_SEQ] += 1
+        s[MB_TRACK_REL] = rel_ms
+        s[MB_TRACK_DUR] = duration_ms
+        s[MB_TRACK_PLAYING] = 1 if playing else 0
+        s[MB_SEQ] += 1
+
+    def read(self):
+        """Copy a consistent record into snap. Returns True if it is new."""
+        s = self.slots
+        snap = self.snap
+        for _ in range(MB_READ_RETRIES):
+            seq = s[MB_SEQ]
+            if seq & 1:
+                continue
+            for i in range(1, MB_SIZE):
+                snap[i] = s[i]
+            if s[MB_SEQ] == seq:
+                if seq == self.last_seq:
+                    return False
+                snap[MB_SEQ] = seq
+                self.last_seq = seq
+                return True
         return False
-    finally:
-        if sock:
-            try:
-                sock.close()
-            except:
-                pass
+
+    def stalled(self, now):
+        """
+        True if core 1 has stopped running rounds. Uses the heartbeat,
+        not the data sequence, since nothing is published while the
+        breaker holds requests back.
+        """
+        beats = self.beats
+        if beats != self.last_beats:
+            self.last_beats = beats
+            self.last_beat = now
+        return (now - self.last_beat) > WORKER_STALL_SECONDS
+
+def network_worker(mb):
+    """Core 1 loop: owns WiFi, NTP and Sonos sockets, publishes results."""
+    seen_req = mb.reinit_req
+    while True:
+        mb.beats += 1
+        try:
+            if mb.reinit_req != seen_req:
+                seen_req = mb.reinit_req
+                breaker.reset()
+                if check_wifi():
+                    sync_ntp()
+            if mb.power_save_req != radio_power_save:
+                apply_power_save(mb.power_save_req)
+            wifi_ok = poll_link()
+            result = fetch_speaker() if wifi_ok else (None, False)
+            if result is not None:
+                mb.publish(result[0], result[1], wifi_ok)
+            position = sync_position() if wifi_ok else None
+            if position is not None:
+                mb.publish_position(*position)
+        except Exception as e:
+            print("Worker error:", e)
+        time.sleep(poll_period())
+
+def start_network_core():
+    """Start the network worker on core 1. Returns the mailbox or None."""
+    if not DUAL_CORE or _thread is None:
+        print("Single-core mode")
+        return None
+    mb = StateMailbox()
+    try:
+        _thread.start_new_thread(network_worker, (mb,))
+    except Exception as e:
+        print("Core 1 not available:", e)
+        return None
+    print("Dual-core mode")
+    return mb
+
+next_poll = None  # Single-core: ticks_ms when the network is polled next
+
+def poll_wait():
+    """Seconds until the next single-core network poll"""
+    if next_poll is None:
+        return 0
+    return max(0, time.ticks_diff(next_poll, time.ticks_ms())) / 1000
+
+def poll_speaker():
+    """
+    Get the latest (vol, mute). Returns None when there is nothing new:
+    in dual-core mode when core 1 has not published since the last read,
+    in single-core mode when the next poll is not due yet (the loop also
+    runs between display flush steps).
+    """
+    global next_poll
+    if mailbox is None:
+        if poll_wait() > 0:
+            return None
+        if poll_link():
+            result = fetch_speaker()
+            position = sync_position()
+            if position is not None:
+                progress.update(*position)
+        else:
+            result = None, False
+        # Counted from the end of the round, like the sleep it replaces
+        next_poll = time.ticks_add(time.ticks_ms(), int(poll_period() * 1000))
+        return result
+    if not mailbox.read():
+        return None
+    snap = mailbox.snap
+    if snap[MB_TRACK_SEQ] != mailbox.track_seq:
+        mailbox.track_seq = snap[MB_TRACK_SEQ]
+        progress.update(snap[MB_TRACK_REL], snap[MB_TRACK_DUR], snap[MB_TRACK_PLAYING] == 1)
+    vol = snap[MB_VOL]
+    if vol < 0:
+        return None, False
+    return vol, snap[MB_MUTE] == 1
+
+def loop_sleep(seconds):
+    """
+    Sleep between loop iterations; core 0 only ticks briefly in dual-core mode.
+    While a frame is being flushed this sends one step of pages and returns
+    at once, so the button, timers and sockets are serviced between steps.
+    Never sleeps past the next poll or timer deadline.
+    """
+    if frames.step():
+        return
+    # The frame is out, so a pause here can't hold up a draw
+    gcm.slack()
+    if mailbox is None:
+        seconds = min(seconds, poll_wait())
+        wait_ms = sched.until_next()
+        if wait_ms is not None and wait_ms < seconds * 1000:
+            seconds = wait_ms / 1000
+        idle_sleep(seconds)
+    else:
+        time.sleep(CORE0_TICK)
 
 # ============================================================
 # INIT / REINIT
 # ============================================================
-def init_system():
+def init_system(quiet=False):
     """
     Initialize system: check WiFi, sync time.
     Each status screen shows for at least MIN_STATUS_DISPLAY seconds.
+    With quiet=True no status or error screens are drawn, so a restored
+    speaker state stays on the display while the network comes up.
     Returns True if all checks pass, False otherwise.
     """
-    global last_reinit_time
-    
     print("Init started")
     
+    def status(line1, line2, dwell):
+        if not quiet:
+            show_status(line1, line2)
+            time.sleep(dwell)
+    
+    def error(error_type):
+        if not quiet:
+            show_error(error_type)
+            time.sleep(1)
+    
     # Step 1: WiFi check
-    show_status("Checking", "WiFi...")
+    if not quiet:
+        show_status("Checking", "WiFi...")
     start = time.time()
     wifi_ok = check_wifi()
     elapsed = time.time() - start
-    if elapsed < MIN_STATUS_DISPLAY:
+    if not quiet and elapsed < MIN_STATUS_DISPLAY:
         time.sleep(MIN_STATUS_DISPLAY - elapsed)
     
     if not wifi_ok:
-        show_error("wifi_timeout")
-        time.sleep(1)
+        error("wifi_timeout")
         return False
     
     # Show WiFi OK
-    show_status("WiFi", "Connected")
-    time.sleep(MIN_STATUS_DISPLAY)
+    status("WiFi", "Connected", MIN_STATUS_DISPLAY)
     
     # Step 2: Time sync
-    show_status("Syncing", "Time...")
+    if not quiet:
+        show_status("Syncing", "Time...")
     start = time.time()
     ntp_ok = sync_ntp()
     elapsed = time.time() - start
-    if elapsed < MIN_STATUS_DISPLAY:
+    if not quiet and elapsed < MIN_STATUS_DISPLAY:
         time.sleep(MIN_STATUS_DISPLAY - elapsed)
     
     if not ntp_ok:
-        show_error("ntp")
-        time.sleep(1)
+        error("ntp")
         return False
     
     # Show Time OK
-    show_status("Time", "Synced")
-    time.sleep(MIN_STATUS_DISPLAY)
+    status("Time", "Synced", MIN_STATUS_DISPLAY)
     
-    last_reinit_time = time.time()
     print("Init completed successfully")
     return True
 
+# ============================================================
+# GARBAGE COLLECTION
+# ============================================================
+class GcManager:
+    """
+    Puts collections into slack time instead of wherever the heap runs
+    out. The GC_INTERVAL timer only marks a collection due; it runs from
+    loop_sleep once the current frame is flushed, so never between
+    spotting a change and drawing it. While dimmed, heap pressure
+    triggers one sooner. gc.threshold() is tuned to twice the allocation
+    expected per interval, as a backstop. report() shows the pauses.
+    """
+    def __init__(self):
+        self.heap = hasattr(gc, "mem_alloc")  # Heap figures are MicroPython-only
+        self.due = False
+        self.hist = [0] * (len(GC_PAUSE_BUCKETS_MS) + 1)
+        self.collections = 0
+        self.total_pause_us = 0
+        self.max_pause_us = 0
+        self.recovered = 0    # Bytes freed by the last collection
+        self.rate = None      # Allocation rate in bytes/s, smoothed
+        self.budget = 0       # Current gc.threshold()
+        self.last_ms = time.ticks_ms()
+        self.alloc_after = gc.mem_alloc() if self.heap else 0
+
+    def mark_due(self):
+        self.due = True
+
+    def slack(self):
+        """Collect if one is due or the heap is filling up"""
+        if self.due:
+            self.collect()
+        elif self.heap and self.budget:
+            # Half the budget normally, a quarter while nobody is looking
+            limit = self.budget // 4 if is_dimmed else self.budget // 2
+            if gc.mem_alloc() - self.alloc_after > limit:
+                self.collect()
+
+    def collect(self):
+        now = time.ticks_ms()
+        before = gc.mem_alloc() if self.heap else 0
+        start = time.ticks_us()
+        gc.collect()
+        pause = time.ticks_diff(time.ticks_us(), start)
+        self.due = False
+        self.collections += 1
+        self.total_pause_us += pause
+        self.max_pause_us = max(self.max_pause_us, pause)
+        i = 0
+        while i < len(GC_PAUSE_BUCKETS_MS) and pause >= GC_PAUSE_BUCKETS_MS[i] * 1000:
+            i += 1
+        self.hist[i] += 1
+        if self.heap:
+            after = gc.mem_alloc()
+            self.recovered = before - after
+            elapsed = time.ticks_diff(now, self.last_ms)
+            if elapsed > 0:
+                rate = (before - self.alloc_after) * 1000 // elapsed
+                self.rate = rate if self.rate is None else (self.rate * 3 + rate) // 4
+                self._tune(after)
+            self.alloc_after = after
+        self.last_ms = now
+        # The next scheduled collection is a full interval from this one
+        sched.restart(gc_timer)
+
+    def _tune(self, used):
+        heap = used + gc.mem_free()
+        self.budget = max(GC_THRESHOLD_MIN, min(self.rate * GC_INTERVAL * 2, heap // 2))
+        gc.threshold(self.budget)
+
+    def report(self):
+        """Pause histogram and heap figures, for the REPL"""
+        labels = ["<{}ms".format(b) for b in GC_PAUSE_BUCKETS_MS]
+        labels.append(">={}ms".format(GC_PAUSE_BUCKETS_MS[-1]))
+        lines = [
+            "{} collections, max pause {} us, avg {} us".format(
+                self.collections, self.max_pause_us,
+                self.total_pause_us // self.collections if self.collections else 0),
+            " ".join("{}:{}".format(l, n) for l, n in zip(labels, self.hist)),
+        ]
+        if self.heap:
+            lines.append("last recovered {} B, alloc rate {} B/s, threshold {} B, free {} B".format(
+                self.recovered, self.rate, self.budget, gc.mem_free()))
+        return "\n".join(lines)
+
+gcm = GcManager()
+
+# ============================================================
+# TIMERS
+# ============================================================
+class Scheduler:
+    """
+    One-shot and periodic callbacks on ticks_ms deadlines. Timers are
+    kept soonest first, compared with ticks_diff so the ticks wrap is
+    harmless; with only a handful of timers insertion is a short scan.
+    A timer is a list [deadline, interval_ms, periodic, callback].
+    """
+    def __init__(self):
+        self.timers = []
+
+    def _insert(self, timer):
+        i = 0
+        while i < len(self.timers) and time.ticks_diff(self.timers[i][0], timer[0]) <= 0:
+            i += 1
+        self.timers.insert(i, timer)
+
+    def _remove(self, timer):
+        for i in range(len(self.timers)):
+            if self.timers[i] is timer:
+                del self.timers[i]
+                return True
+        return False
+
+    def every(self, seconds, callback):
+        """Call callback every seconds, first one period from now"""
+        return self.restart([0, int(seconds * 1000), True, callback])
+
+    def after(self, seconds, callback):
+        """Call callback once, seconds from now"""
+        return self.restart([0, int(seconds * 1000), False, callback])
+
+    def restart(self, timer, seconds=None):
+        """(Re)arm timer one interval from now, or seconds from now"""
+        self._remove(timer)
+        delay = timer[1] if seconds is None else int(seconds * 1000)
+        timer[0] = time.ticks_add(time.ticks_ms(), delay)
+        self._insert(timer)
+        return timer
+
+    def cancel(self, timer):
+        self._remove(timer)
+
+    def pending(self, timer):
+        """True if timer is armed and has not fired yet"""
+        for t in self.timers:
+            if t is timer:
+                return True
+        return False
+
+    def until_next(self):
+        """Milliseconds to the nearest deadline, or None with no timers"""
+        if not self.timers:
+            return None
+        return max(0, time.ticks_diff(self.timers[0][0], time.ticks_ms()))
+
+    def run(self):
+        """Fire every timer that is due"""
+        now = time.ticks_ms()
+        while self.timers and time.ticks_diff(self.timers[0][0], now) <= 0:
+            timer = self.timers.pop(0)
+            if timer[2]:
+                # Missed periods are skipped, not replayed
+                timer[0] = time.ticks_add(timer[0], timer[1])
+                if time.ticks_diff(timer[0], now) <= 0:
+                    timer[0] = time.ticks_add(now, timer[1])
+                self._insert(timer)
+            timer[3]()
+
+sched = Scheduler()
+
+def on_reinit_timer():
+    print("Auto reinit triggered")
+    if mailbox:
+        mailbox.reinit_req += 1
+    else:
+        reinit_local(quiet=True)
+
+def on_clock_timer():
+    """Show the time, unless the display is off or showing an error"""
+    global showing_time
+    if not display_on or speaker_error or showing_time:
+        return
+    showing_time = True
+    show_time()
+    sched.restart(clock_end_timer)
+
+def on_clock_end():
+    """Time display done, go back to speaker state"""
+    global showing_time
+    if not showing_time:
+        return
+    showing_time = False
+    show_speaker_state(last_vol, last_mute)
+    if not sched.pending(off_timer) and not speaker_error:
+        # The idle timeout ran out while the time was showing
+        set_display_off()
+    # Restore brightness state
+    elif sched.pending(dim_timer):
+        set_bright()
+    else:
+        set_dim()
+
+def on_dim_timer():
+    # While the time shows, on_clock_end picks the brightness
+    if not is_dimmed and not showing_time and not speaker_error:
+        set_dim()
+
+def on_off_timer():
+    # While the time shows, on_clock_end powers off when it is done
+    if display_on and not speaker_error and not showing_time:
+        set_display_off()
+
+# Armed by start_timers() once boot is done
+gc_timer = [0, int(GC_INTERVAL * 1000), True, gcm.mark_due]
+reinit_timer = [0, int(REINIT_INTERVAL * 1000), True, on_reinit_timer]
+clock_timer = [0, int(TIME_DISPLAY_INTERVAL * 1000), True, on_clock_timer]
+clock_end_timer = [0, int(TIME_DISPLAY_DURATION * 1000), False, on_clock_end]
+dim_timer = [0, int(DIM_AFTER_SECONDS * 1000), False, on_dim_timer]
+off_timer = [0, int(DISPLAY_OFF_AFTER * 1000), False, on_off_timer]
+
+def start_timers():
+    for timer in (gc_timer, reinit_timer, clock_timer, dim_timer, off_timer):
+        sched.restart(timer)
+
+def note_activity():
+    """Restart the idle timers: time display, dim and display off"""
+    sched.restart(clock_timer)
+    sched.restart(dim_timer)
+    sched.restart(off_timer)
+
 # ============================================================
 # MAIN LOOP
 # ============================================================
+def show_change(vol, mute):
+    """Draw a new speaker state at full brightness and restart the idle timers."""
+    global last_vol, last_mute, showing_time, speaker_error, state_stale
+    last_vol = vol
+    last_mute = mute
+    showing_time = False
+    speaker_error = False
+    state_stale = False
+    note_activity()
+    show_speaker_state(vol, mute)
+    set_bright()
+
+def reinit_local(quiet=False):
+    """
+    Single-core reinit: WiFi/NTP on this core, then redraw. The periodic
+    reinit runs quiet, like core 1's, and only counts as activity when
+    the speaker state changed, so it does not keep an idle panel awake.
+    """
+    sched.restart(reinit_timer)
+    if init_system(quiet=quiet):
+        breaker.reset()
+        vol, mute = read_speaker()
+        if vol is None:
+            return
+        if not quiet or speaker_error or state_stale or vol != last_vol or mute != last_mute:
+            show_change(vol, mute)
+
+def request_reinit():
+    """Hand a WiFi/NTP reinit to core 1; core 0 keeps running."""
+    global last_vol, showing_time
+    mailbox.reinit_req += 1
+    sched.restart(reinit_timer)
+    last_vol = None  # Redraw on the next published result
+    showing_time = False
+
 def main():
-    global last_vol, last_mute, last_change_time, last_time_shown
-    global last_reinit_time, is_dimmed, showing_time, time_show_start
-    global last_gc_time, wdt
+    global last_vol, last_mute, showing_time
+    global wdt, mailbox, push, speaker_error, state_stale
     
     # Initial setup
     set_bright()
     
-    # Run init until successful
-    while not init_system():
-        print("Init failed, retrying in 5 seconds...")
-        time.sleep(5)
+    # Show what the speaker was doing before the reset while init runs
+    saved = restore_state()
+    
+    # Run init until successful. With a saved state up, one quiet attempt
+    # is enough: the loop takes it from there with the watchdog and button
+    # running, the link checks and breaker bring up the error screen if
+    # the outage lasts, and init is retried off the reinit timer.
+    init_ok = True
+    if saved is None:
+        while not init_system():
+            print("Init failed, retrying in 5 seconds...")
+            time.sleep(5)
+    elif not init_system(quiet=True):
+        print("Init failed, continuing with the saved state")
+        init_ok = False
     
     # Initialize watchdog timer - will reset device if not fed
     try:
@@ -498,142 +2188,100 @@ def main():
         wdt = None
     
     # Initial garbage collection
-    gc.collect()
-    last_gc_time = time.time()
+    gcm.collect()
     
     # Get initial volume and show it
-    vol = get_volume(SONOS_IP)
-    mute = get_mute(SONOS_IP)
+    vol, mute = read_speaker() if init_ok else (None, False)
     
-    if vol is None:
+    if vol is None and saved:
+        # Keep showing the saved state until the speaker answers
+        vol, mute = saved
+    elif vol is None:
         show_error("sonos")
         time.sleep(1)
         vol = 0
         mute = False
+    else:
+        state_stale = False
     
     last_vol = vol
     last_mute = mute
-    last_change_time = time.time()
-    last_time_shown = time.time()
     
     show_speaker_state(vol, mute)
     set_bright()
     
-    error_count = 0
+    # Network I/O moves to core 1 from here on, if available
+    push = start_push()
+    start_mirror()
+    mailbox = start_network_core()
+    arm_button_wake()
+    
+    # GC, reinit, time display, dim and display off run off the scheduler
+    start_timers()
+    if not init_ok:
+        sched.restart(reinit_timer, INIT_RETRY)
     
     # Main loop
     while True:
         now = time.time()
         
-        # Feed the watchdog to prevent reset
-        if wdt:
+        # Feed the watchdog to prevent reset. If core 1 has stopped
+        # publishing, let the watchdog reset the device.
+        if wdt and not (mailbox and mailbox.stalled(now)):
             wdt.feed()
         
-        # Periodic garbage collection
-        if (now - last_gc_time) > GC_INTERVAL:
-            gc.collect()
-            last_gc_time = now
+        sched.run()
+        state_store.tick(now)
+        update_progress_bar()
+        if oled.mirror:
+            oled.mirror.tick(frames.front_buf)
         
         # Check for button press - triggers reinit
         if check_button():
             print("Button pressed - reinit")
-            if init_system():
-                vol = get_volume(SONOS_IP)
-                mute = get_mute(SONOS_IP)
-                if vol is not None:
-                    last_vol = vol
-                    last_mute = mute
-                    last_change_time = now
-                    last_time_shown = now
-                    showing_time = False
-                    show_speaker_state(vol, mute)
-                    set_bright()
-                    error_count = 0
-            continue
-        
-        # Check for auto reinit (every 30 minutes)
-        if (now - last_reinit_time) > REINIT_INTERVAL:
-            print("Auto reinit triggered")
-            if init_system():
-                vol = get_volume(SONOS_IP)
-                mute = get_mute(SONOS_IP)
-                if vol is not None:
-                    last_vol = vol
-                    last_mute = mute
-                    last_change_time = now
-                    last_time_shown = now
-                    showing_time = False
-                    show_speaker_state(vol, mute)
-                    set_bright()
-                    error_count = 0
+            set_bright()
+            note_activity()
+            if mailbox:
+                request_reinit()
+                show_status("Reinit", "Network...")
+                speaker_error = False
+            else:
+                reinit_local()
             continue
         
-        # If showing time, check if duration elapsed
+        # While showing time, just poll for changes; on_clock_end ends it
         if showing_time:
-            if (now - time_show_start) >= TIME_DISPLAY_DURATION:
-                # Time display done, go back to speaker state
-                showing_time = False
-                show_speaker_state(last_vol, last_mute)
-                
-                # Restore brightness state
-                if (now - last_change_time) > DIM_AFTER_SECONDS:
-                    set_dim()
-                else:
-                    set_bright()
-            else:
-                # Still showing time, just poll for changes
-                vol = get_volume(SONOS_IP)
-                mute = get_mute(SONOS_IP)
-                
+            result = poll_speaker()
+            if result is not None:
+                vol, mute = result
                 if vol is not None and (vol != last_vol or mute != last_mute):
                     # Change detected - exit time display immediately
-                    last_vol = vol
-                    last_mute = mute
-                    last_change_time = now
-                    last_time_shown = now
-                    showing_time = False
-                    show_speaker_state(vol, mute)
-                    set_bright()
-                
-                time.sleep(0.2)
-                continue
+                    show_change(vol, mute)
+            loop_sleep(0.2)
+            continue
         
         # Normal operation - poll Sonos
-        vol = get_volume(SONOS_IP)
-        mute = get_mute(SONOS_IP)
+        result = poll_speaker()
+        if result is None:
+            # Nothing new yet (core 1 hasn't published, or no poll is due)
+            loop_sleep(POLL_INTERVAL)
+            continue
+        vol, mute = result
         
         if vol is None:
-            error_count += 1
-            if error_count > 5:
-                show_error("sonos")
-                time.sleep(1)
-                error_count = 0
-            time.sleep(0.5)
+            # The breaker decides when the speaker counts as down
+            if speaker_down() and not speaker_error:
+                show_error("wifi" if wifi_down() else "sonos")
+                speaker_error = True
+            loop_sleep(POLL_INTERVAL)
             continue
         
-        error_count = 0
-        
-        # Check for changes
-        if vol != last_vol or mute != last_mute:
-            last_vol = vol
-            last_mute = mute
-            last_change_time = now
-            last_time_shown = now  # Reset time display timer on change
-            show_speaker_state(vol, mute)
-            set_bright()
-        
-        # Check if we should show time (every 1 minute)
-        elif (now - last_time_shown) > TIME_DISPLAY_INTERVAL:
-            showing_time = True
-            time_show_start = now
-            last_time_shown = now
-            show_time()
-        
-        # Check if we should dim (30 seconds after last change)
-        elif not is_dimmed and (now - last_change_time) > DIM_AFTER_SECONDS:
-            set_dim()
+        # Check for changes (or recovery from the error or stale screen)
+        if speaker_error or state_stale or vol != last_vol or mute != last_mute:
+            show_change(vol, mute)
         
-        time.sleep(0.5)
+        loop_sleep(POLL_INTERVAL)
 
 # Run
-main()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
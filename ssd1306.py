@@ -27,6 +27,9 @@ class SSD1306(framebuf.FrameBuffer):
         self.external_vcc = external_vcc
         self.pages = self.height // 8
         self.buffer = bytearray(self.pages * self.width)
+        self.pointer = None  # (page, col) the controller will write next, if known
+        self.window = bytearray(6)  # Address command block, reused
+        self.mirror = None   # Optional sink with frame(buf, prev) and page(buf, page)
         super().__init__(self.buffer, self.width, self.height, framebuf.MONO_VLSB)
         self.init_display()
 
@@ -66,13 +69,42 @@ class SSD1306(framebuf.FrameBuffer):
         self.write_cmd(SET_NORM_INV | (invert & 1))
 
     def show(self):
-        self.write_cmd(SET_COL_ADDR)
-        self.write_cmd(0)
-        self.write_cmd(self.width - 1)
-        self.write_cmd(SET_PAGE_ADDR)
-        self.write_cmd(0)
-        self.write_cmd(self.pages - 1)
-        self.write_data(self.buffer)
+        self.show_pages(self.buffer, 0, self.pages - 1)
+        if self.mirror:
+            self.mirror.frame(self.buffer)
+
+    def set_window(self, col, first, last):
+        # Column and page address window in one transaction
+        w = self.window
+        w[0] = SET_COL_ADDR
+        w[1] = col
+        w[2] = self.width - 1
+        w[3] = SET_PAGE_ADDR
+        w[4] = first
+        w[5] = last
+        self.write_cmds(w)
+
+    def show_pages(self, buf, first, last):
+        # Send pages first..last of a full-frame buffer. The window runs
+        # to the bottom of the display, so a call for the following pages
+        # (the next paged flush step) sends only data.
+        if self.pointer != (first, 0):
+            self.set_window(0, first, self.pages - 1)
+        self.write_data(memoryview(buf)[first * self.width:(last + 1) * self.width])
+        self.pointer = (last + 1, 0) if last + 1 < self.pages else None
+
+    def show_columns(self, buf, page, col, n=1):
+        # Send n bytes of one page starting at col. If the controller's
+        # address pointer is already there (the previous call ended at
+        # col), only the data bytes go out.
+        if self.pointer != (page, col):
+            self.set_window(col, page, page)
+        start = page * self.width + col
+        self.write_data(memoryview(buf)[start:start + n])
+        col += n
+        self.pointer = (page, col) if col < self.width else None
+        if self.mirror:
+            self.mirror.page(buf, page)
 
 
 class SSD1306_I2C(SSD1306):
@@ -87,5 +119,61 @@ class SSD1306_I2C(SSD1306):
         self.temp[1] = cmd
         self.i2c.writeto(self.addr, self.temp)
 
+    def write_cmds(self, cmds):
+        self.i2c.writevto(self.addr, (b"\x00", cmds))
+
     def write_data(self, buf):
-        self.i2c.writeto(self.addr, b"\x40" + buf)
+        self.i2c.writevto(self.addr, (b"\x40", buf))
+
+
+class DoubleBuffer:
+    # Rendering goes into `back` while `front` is sent a few pages per
+    # step(). present() swaps the two by reference; if a flush is still
+    # running the swap waits until it completes, so no frame is torn.
+    def __init__(self, display, pages_per_step=1):
+        self.display = display
+        self.pages_per_step = pages_per_step
+        self.front_buf = display.buffer
+        self.front = display
+        self.back_buf = bytearray(len(display.buffer))
+        self.back = framebuf.FrameBuffer(
+            self.back_buf, display.width, display.height, framebuf.MONO_VLSB
+        )
+        self.next_page = display.pages  # Nothing in flight
+        self.pending = False
+
+    def busy(self):
+        return self.pending or self.next_page < self.display.pages
+
+    def present(self):
+        if self.next_page < self.display.pages:
+            self.pending = True
+        else:
+            self._swap()
+
+    def _swap(self):
+        self.front_buf, self.back_buf = self.back_buf, self.front_buf
+        self.front, self.back = self.back, self.front
+        self.next_page = 0
+        self.pending = False
+        if self.display.mirror:
+            # back_buf still holds the previous frame, so only changed
+            # pages need to be mirrored
+            self.display.mirror.frame(self.front_buf, self.back_buf)
+
+    def step(self):
+        # Send the next chunk of pages. Returns True while work remains.
+        d = self.display
+        if self.next_page >= d.pages:
+            if not self.pending:
+                return False
+            self._swap()
+        first = self.next_page
+        last = min(first + self.pages_per_step, d.pages) - 1
+        d.show_pages(self.front_buf, first, last)
+        self.next_page = last + 1
+        return self.busy()
+
+    def flush(self):
+        while self.step():
+            pass